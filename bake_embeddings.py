@@ -1,25 +1,217 @@
+#!/usr/bin/env python3
+"""
+Embed every English gloss of the dictionary and write the embedding store
+and vector index used by `auto`.
+
+Glosses are sent in batches over a pool of concurrent embed requests. Each
+finished batch is appended to a checkpoint keyed by code and gloss hash, so
+an interrupted bake resumes where it stopped and a rerun only embeds glosses
+that are missing or have changed.
+
+With --incremental, the existing store is upgraded to the current dictionary
+version: rows are remapped through the version diff and only added, renamed
+without a stored vector, or re-glossed terms are embedded.
+"""
+import argparse
+import hashlib
 import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import numpy as np
 from ollama import Client
-from ieml_api import dic
+from ieml.dictionary.version import DictionaryVersion
 
+from ieml_retrieval import validate_codes
+from ieml_index import build_index, index_path, save_index
+from ieml_store import STORE_PREFIX, EmbeddingStore, matrix_path, save_store, store_exists
 
-client = Client()
 EMBED_MODEL = "nomic-embed-text"
+CHECKPOINT_PATH = "gloss_embeddings.ckpt.jsonl"
+
+
+def gloss_hash(gloss: str) -> str:
+    return hashlib.sha1(gloss.encode("utf8")).hexdigest()[:16]
+
+
+def gloss_key(code: str, gloss: str) -> str:
+    return f"{code}\t{gloss_hash(gloss)}"
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines file of {"key", "model", "embedding"} records.
+    A truncated last line (interrupted write) is ignored on load.
+    """
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self.vectors = {}
+
+        if path and os.path.isfile(path):
+            with open(path, encoding="utf8") as fp:
+                for line in fp:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if rec.get("model") == model:
+                        self.vectors[rec["key"]] = rec["embedding"]
+
+    def __contains__(self, key):
+        return key in self.vectors
+
+    def add(self, keys, embeddings):
+        lines = []
+        for key, emb in zip(keys, embeddings):
+            self.vectors[key] = emb
+            lines.append(json.dumps({"key": key, "model": self.model, "embedding": emb}))
+        if self.path:
+            with open(self.path, "a", encoding="utf8") as fp:
+                fp.write("\n".join(lines) + "\n")
+
+    def compact(self, keys):
+        # drop records for glosses that no longer exist or have changed
+        keys = set(keys)
+        self.vectors = {k: v for k, v in self.vectors.items() if k in keys}
+        if self.path:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf8") as fp:
+                for key, emb in self.vectors.items():
+                    fp.write(json.dumps({"key": key, "model": self.model, "embedding": emb}) + "\n")
+            os.replace(tmp, self.path)
+
+
+def embed_glosses(client, items, checkpoint, model=EMBED_MODEL, batch_size=64, workers=4,
+                  out=sys.stderr):
+    """
+    Embed the (code, gloss) items missing from the checkpoint.
+    :return: list of embeddings in the order of `items`
+    """
+    keys = [gloss_key(code, gloss) for code, gloss in items]
+    todo = []
+    pending = set()
+    for key, (_, gloss) in zip(keys, items):
+        if key not in checkpoint and key not in pending:
+            pending.add(key)
+            todo.append((key, gloss))
+
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    print(f"{len(items) - len(todo)} glosses already embedded, {len(todo)} to embed "
+          f"in {len(batches)} batches", file=out)
+
+    def run(batch):
+        resp = client.embed(model=model, input=[gloss for _, gloss in batch])
+        return batch, resp.embeddings
+
+    start = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(run, b) for b in batches]):
+            batch, embeddings = future.result()
+            checkpoint.add([key for key, _ in batch], embeddings)
+            done += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"\r  {done}/{len(todo)} glosses, {done / elapsed:.1f} glosses/s",
+                  end="", file=out, flush=True)
+    if batches:
+        print(file=out)
+
+    return [checkpoint.vectors[key] for key in keys]
+
+
+def plan_incremental(store, old_version, new_version, en_map):
+    """
+    Work out which rows of `store` (baked against `old_version`) can be reused
+    for `new_version`, following renamed scripts through the version diff.
+    :return: (dict new code -> old row, summary counts)
+    """
+    renames = new_version.diff_for_version(old_version)
+
+    # terms added by the versions published since the store was baked
+    since = [v for v in new_version.history if DictionaryVersion(v) > old_version]
+    added = {t for v in since for t, op in new_version.history[v].items() if op == '+'}
+
+    reuse = {}
+    summary = {"reused": 0, "renamed": 0, "reglossed": 0, "removed": 0, "added": 0}
+    for row, (code, digest) in enumerate(zip(store.codes, store.gloss_hashes)):
+        new_code = renames.get(code, code)
+        if new_code not in en_map:
+            summary["removed"] += 1
+            continue
+        if gloss_hash(en_map[new_code]) != digest:
+            summary["reglossed"] += 1
+            continue
+        reuse[new_code] = row
+        summary["renamed" if new_code != code else "reused"] += 1
+
+    summary["added"] = sum(1 for code in en_map if code not in reuse and code in added)
+    return reuse, summary
+
+
+def write_store(codes, embeddings, index_kind="flat", float16=False, prefix=STORE_PREFIX,
+                gloss_hashes=None, version=None):
+    # validate once at bake time so queries never have to parse codes
+    clean_codes, valid = validate_codes(codes)
+
+    save_store(prefix, codes, np.array(embeddings, dtype=np.float32), clean_codes, valid,
+               dtype=np.float16 if float16 else np.float32,
+               gloss_hashes=gloss_hashes, version=version)
+
+    index = build_index(EmbeddingStore(prefix).matrix, index_kind, normalized=True)
+    save_index(index, index_path(matrix_path(prefix)))
+    return valid
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--host", help="Ollama server url (defaults to OLLAMA_HOST)")
+    ap.add_argument("--model", default=EMBED_MODEL)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=4, help="concurrent embed requests")
+    ap.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    # flat (exact) or ivf (approximate), see bench_index.py to choose
+    ap.add_argument("--index", default=os.environ.get("IEML_INDEX", "flat"), choices=["flat", "ivf"])
+    ap.add_argument("--float16", action="store_true", default=bool(os.environ.get("IEML_FLOAT16")))
+    ap.add_argument("--incremental", action="store_true",
+                    help="upgrade the existing store to the current dictionary version")
+    args = ap.parse_args()
+
+    from ieml_api import dic
+
+    client = Client(host=args.host)
+    en_map = dic.translations.get("en", {})
+    items = list(en_map.items())
+    checkpoint = Checkpoint(args.checkpoint, args.model)
+
+    reuse = {}
+    if args.incremental:
+        store = EmbeddingStore(STORE_PREFIX) if store_exists(STORE_PREFIX) else None
+        if store is None or store.version is None or store.gloss_hashes is None:
+            sys.exit("No store with version information to upgrade, run a full bake first")
+
+        old_version = DictionaryVersion(store.version)
+        reuse, summary = plan_incremental(store, old_version, dic.version, en_map)
+        print(f"{old_version} -> {dic.version}: " +
+              ", ".join(f"{n} {what}" for what, n in summary.items()), file=sys.stderr)
 
-en_map = dic.translations.get("en", {})
-codes   = list(en_map.keys())
-glosses = list(en_map.values())
+    missing = [(code, gloss) for code, gloss in items if code not in reuse]
+    fresh = iter(embed_glosses(client, missing, checkpoint, model=args.model,
+                               batch_size=args.batch_size, workers=args.workers))
+    embeddings = [store.matrix[reuse[code]] if code in reuse else next(fresh)
+                  for code, _ in items]
 
-resp = client.embed(model=EMBED_MODEL, input=glosses)
+    checkpoint.compact(gloss_key(code, gloss) for code, gloss in missing)
 
-embeddings = resp.embeddings  
+    codes = [code for code, _ in items]
+    valid = write_store(codes, embeddings, args.index, args.float16,
+                        gloss_hashes=[gloss_hash(gloss) for _, gloss in items],
+                        version=dic.version)
 
-with open("gloss_embeddings.json", "w", encoding="utf8") as f:
-    json.dump({"codes": codes, "embeddings": embeddings}, f)
+    print(f"Saved {len(codes)} embeddings ({int(valid.sum())} valid terms) to {matrix_path(STORE_PREFIX)} with a {args.index} index")
 
-np.savez("gloss_embeddings.npz",
-         codes=codes,
-         embeddings=np.array(embeddings, dtype=float))
 
-print(f"Saved {len(codes)} embeddings to gloss_embeddings.npz")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Recall@k versus latency for the vector index backends.
+
+Runs against the baked gloss embeddings by default, or a synthetic clustered set
+(--synthetic N) to size backends for larger multilingual gloss sets.
+"""
+import argparse
+import time
+import numpy as np
+
+from ieml_index import build_index
+from ieml_retrieval import normalize_rows
+from ieml_store import STORE_PREFIX, EmbeddingStore
+
+
+def synthetic(n, dim, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    rows = centers[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return rows.astype(np.float32)
+
+
+def recall_latency(index, queries, truth, k, **search_kw):
+    hits = 0
+    times = []
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        ids, _ = index.search(q, k, **search_kw)
+        times.append(time.perf_counter() - t0)
+        hits += len(set(ids.tolist()) & set(expected.tolist()))
+    times = np.array(times) * 1000
+    return hits / (k * len(queries)), np.percentile(times, 50), np.percentile(times, 95)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--embeddings", default=STORE_PREFIX,
+                    help="store prefix or legacy .npz file")
+    ap.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic rows instead")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=15)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = ap.parse_args()
+
+    if args.synthetic:
+        matrix = synthetic(args.synthetic, args.dim)
+    elif args.embeddings.endswith(".npz"):
+        matrix = np.load(args.embeddings, allow_pickle=True)["embeddings"].astype(np.float32)
+    else:
+        matrix = np.asarray(EmbeddingStore(args.embeddings).matrix, dtype=np.float32)
+    matrix = normalize_rows(matrix)
+
+    rng = np.random.default_rng(1)
+    # perturbed rows stand in for concept embeddings
+    queries = matrix[rng.integers(len(matrix), size=args.queries)]
+    queries = normalize_rows(queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32))
+
+    flat = build_index(matrix, "flat")
+    truth = [flat.search(q, args.k)[0] for q in queries]
+
+    print(f"{len(matrix)} rows x {matrix.shape[1]} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<16}{'build ms':>10}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+
+    recall, p50, p95 = recall_latency(flat, queries, truth, args.k)
+    print(f"{'flat':<16}{'-':>10}{recall:>10.3f}{p50:>10.3f}{p95:>10.3f}")
+
+    t0 = time.perf_counter()
+    ivf = build_index(matrix, "ivf")
+    build_ms = (time.perf_counter() - t0) * 1000
+    for nprobe in args.nprobe:
+        if nprobe > len(ivf.centroids):
+            continue
+        recall, p50, p95 = recall_latency(ivf, queries, truth, args.k, nprobe=nprobe)
+        print(f"{f'ivf nprobe={nprobe}':<16}{build_ms:>10.0f}{recall:>10.3f}{p50:>10.3f}{p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the REPL commands.
+
+Every workload runs in a fresh interpreter: the first call of each command
+is its cold latency (imports, lazily built indexes, page faults), then
+--iterations warm calls give p50/p95/p99 latency and throughput. Workloads
+are the installed dictionary ("real") and/or a synthetic snapshot of
+--synthetic N terms; `auto` (retrieval alone, and retrieval plus generation)
+runs against a local Ollama stub with --embed-latency seconds per request.
+
+    python bench_repl.py --synthetic 50000 --json > before.json
+    python bench_repl.py --synthetic 50000 --compare before.json
+
+--compare prints the change of every metric against an earlier run and exits
+non-zero when a warm p50 got slower than --threshold.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = ("parse", "parse_invalid", "index", "search", "neighbors", "relation", "dump", "top_primitives",
+            "auto", "semsearch")
+# Commands answered through the embedding store (and the Ollama stub)
+STORE_COMMANDS = ("top_primitives", "auto", "semsearch")
+
+PRIMITIVES = "EUASBT"
+LAYER_MARKS = ":.-'"
+
+
+def synthetic_script(digits, layer):
+    """
+    IEML script of `layer` (0 to 3) from 3 ** layer primitive digits in
+    0..5: "E:", "E:U:S:.", "E:E:E:.E:U:S:.A:A:B:.-", ...
+    """
+    if not layer:
+        return PRIMITIVES[digits[0]] + LAYER_MARKS[0]
+    third = len(digits) // 3
+    return "".join(synthetic_script(digits[i * third:(i + 1) * third], layer - 1)
+                   for i in range(3)) + LAYER_MARKS[layer]
+
+
+def synthetic_snapshot(path, n, degree=8, vocabulary=5000, seed=0):
+    """
+    Write a snapshot of `n` random terms (same sections as ieml_snapshot)
+    to the directory `path`.
+    :return: list of term codes
+    """
+    from ieml_snapshot import SNAPSHOT_FORMAT
+
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    words = ["".join(rng.choice(letters, size=rng.integers(3, 10))) for _ in range(vocabulary)]
+    # layer 2 and 3 scripts of random primitives, as the dictionary codes them
+    layers = 2 + np.arange(n) % 2
+    codes, seen = [], set()
+    for layer in layers.tolist():
+        code = synthetic_script(rng.integers(len(PRIMITIVES), size=3 ** layer).tolist(), layer)
+        while code in seen:
+            code = synthetic_script(rng.integers(len(PRIMITIVES), size=3 ** layer).tolist(), layer)
+        seen.add(code)
+        codes.append(code)
+    glosses = [" ".join(rng.choice(words, size=rng.integers(1, 4))) for _ in range(n)]
+
+    # undirected random graph, `degree` neighbours per term on average
+    rows = rng.integers(n, size=n * degree // 2)
+    cols = rng.integers(n, size=n * degree // 2)
+    keep = rows != cols
+    rows, cols = np.concatenate([rows[keep], cols[keep]]), np.concatenate([cols[keep], rows[keep]])
+    # sorted (row, col) keys give CSR order directly
+    keys = np.unique(rows * n + cols)
+    indices = (keys % n).astype(np.int32)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+
+    types = ["contains", "contained", "opposed", "associated"]
+    sections = {
+        "codes": np.array(codes, dtype=str),
+        "layers": layers.astype(np.int8),
+        "neighbour_counts": np.diff(indptr).astype(np.int32),
+        "translations_en": np.array(glosses, dtype=str),
+        "relations_indptr": indptr,
+        "relations_indices": indices,
+        "neighbours_indptr": indptr,
+        "neighbours_indices": indices,
+        "neighbours_types": (1 << rng.integers(len(types), size=len(indices))).astype(np.uint32),
+    }
+    os.makedirs(path, exist_ok=True)
+    for name, array in sections.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "meta.json"), "w") as fp:
+        json.dump({"format": SNAPSHOT_FORMAT, "version": f"synthetic_{n}", "terms": n,
+                   "languages": ["en"], "relation_types": types}, fp)
+    return codes
+
+
+def synthetic_store(workdir, codes, dim, seed=0):
+    # gloss embeddings for `codes` in the store format, in `workdir`
+    from ieml_store import STORE_PREFIX, save_store
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(len(codes), dim)).astype(np.float32)
+    save_store(os.path.join(workdir, STORE_PREFIX), codes, embeddings, codes,
+               np.ones(len(codes), dtype=bool))
+
+
+def _inputs(codes, glosses, layers, count, seed):
+    """
+    Deterministic arguments for every command. Commands whose input pool is
+    empty (no terms, or no English gloss to draw words from) are left out.
+    """
+    rng = random.Random(seed)
+    words = [w for g in rng.sample(glosses, min(len(glosses), 2000)) for w in g.split()]
+    pick = lambda: rng.choice(codes)
+    concept = lambda: " ".join(rng.choice(words) for _ in range(2))
+    inputs = {}
+    if codes:
+        inputs.update({
+            "parse": [pick() for _ in range(count)],
+            # a dropped character takes the fuzzy suggestion path
+            "parse_invalid": [c[:-1] + "#" for c in (pick() for _ in range(count))],
+            "index": [str(rng.randrange(len(codes))) for _ in range(count)],
+            "neighbors": [pick() for _ in range(count)],
+            "relation": [(pick(), pick()) for _ in range(count)],
+            "dump": [rng.choice(layers) for _ in range(count)],
+        })
+    if words:
+        inputs.update({
+            "search": [rng.choice(words)[:rng.randint(2, 6)] for _ in range(count)],
+            "top_primitives": [concept() for _ in range(count)],
+            "auto": [concept() for _ in range(count)],
+            "semsearch": [concept() for _ in range(count)],
+        })
+    return inputs
+
+
+def worker(spec):
+    """
+    Run in the benchmark subprocess: time the commands of `spec` and return
+    the raw latencies in milliseconds.
+    """
+    t0 = time.perf_counter()
+    import ieml_commands as commands
+    import_ms = (time.perf_counter() - t0) * 1000
+
+    table = commands.term_table
+    en = table.glosses("en")
+    glosses = [g for g in en.tolist() if g] if en is not None else []
+    layers = sorted(set(table.layers.tolist()))
+    inputs = _inputs(table.codes, glosses, layers, spec["iterations"] + 1, spec["seed"])
+
+    def retrieve(concept):
+        from ieml_auto import top_primitives
+        return top_primitives(concept)
+
+    def auto(concept):
+        # retrieval, then one /api/generate request (the response cache is off)
+        from ieml_auto import auto_concept
+        return auto_concept(concept)
+
+    calls = {
+        "parse": commands.term_details,
+        "parse_invalid": commands.term_details,
+        "index": commands.term_by_index,
+        "search": commands.search_english,
+        "neighbors": commands.term_neighbors,
+        "relation": lambda pair: commands.term_relation(*pair),
+        "dump": commands.dump_terms,
+        "top_primitives": retrieve,
+        "auto": auto,
+        "semsearch": commands.semantic_search,
+    }
+
+    results = {"import_ms": import_ms, "commands": {}, "skipped": []}
+    if spec.get("dictionary"):
+        # first, so that no command has built it yet
+        start = time.perf_counter()
+        from ieml_api import get_dictionary
+        get_dictionary()
+        results["dictionary_ms"] = (time.perf_counter() - start) * 1000
+
+    for name in spec["commands"]:
+        if name not in inputs:
+            results["skipped"].append(name)
+            continue
+        fn, args = calls[name], inputs[name]
+        times = []
+        for arg in args:
+            start = time.perf_counter()
+            fn(arg)
+            times.append((time.perf_counter() - start) * 1000)
+        results["commands"][name] = {"cold_ms": times[0], "warm_ms": times[1:]}
+    return results
+
+
+def summarize(raw, wall_ms):
+    summary = {"process_ms": round(wall_ms, 2), "import_ms": round(raw["import_ms"], 2), "commands": {}}
+    if "dictionary_ms" in raw:
+        summary["dictionary_ms"] = round(raw["dictionary_ms"], 2)
+    if raw.get("skipped"):
+        summary["skipped"] = raw["skipped"]
+    for name, r in raw["commands"].items():
+        warm = np.array(r["warm_ms"])
+        p50, p95, p99 = np.percentile(warm, [50, 95, 99])
+        summary["commands"][name] = {
+            "n": len(warm),
+            "cold_ms": round(r["cold_ms"], 3),
+            "p50_ms": round(float(p50), 4),
+            "p95_ms": round(float(p95), 4),
+            "p99_ms": round(float(p99), 4),
+            "ops_per_s": round(len(warm) / (warm.sum() / 1000), 1) if warm.sum() else None,
+        }
+    return summary
+
+
+def run_workload(name, env, cwd, spec):
+    env = {**os.environ, "IEML_CACHE": "", "PYTHONPATH": os.pathsep.join(
+        filter(None, [HERE, os.environ.get("PYTHONPATH")])), **env}
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", json.dumps(spec)],
+                         env=env, cwd=cwd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if out.returncode:
+        raise RuntimeError(f"workload {name} failed:\n{out.stderr}")
+    return summarize(json.loads(out.stdout.strip().splitlines()[-1]), wall_ms)
+
+
+@contextmanager
+def _stub(latency, dim):
+    # Ollama stub answering with `dim`-dimensional embeddings
+    from ollama_stub import OllamaStub
+    stub = OllamaStub(latency=latency, dim=dim).start()
+    try:
+        yield stub.url
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """
+    Print the relative change of every metric; return the warm p50
+    regressions above `threshold` as "workload/command" strings.
+    """
+    regressions = []
+    for workload, result in current["workloads"].items():
+        before = baseline["workloads"].get(workload)
+        if before is None:
+            continue
+        print(f"{workload}  (vs {baseline.get('commit') or 'baseline'})")
+        for cmd, stats in result["commands"].items():
+            old = before["commands"].get(cmd)
+            if old is None:
+                continue
+            deltas = []
+            for key in ("cold_ms", "p50_ms", "p95_ms", "p99_ms"):
+                if old[key]:
+                    deltas.append(f"{key[:-3]} {(stats[key] - old[key]) / old[key]:+7.1%}")
+            print(f"  {cmd:<15} " + "  ".join(deltas))
+            if old["p50_ms"] and (stats["p50_ms"] - old["p50_ms"]) / old["p50_ms"] > threshold:
+                regressions.append(f"{workload}/{cmd}")
+    return regressions
+
+
+def print_table(report):
+    for workload, result in report["workloads"].items():
+        extra = f", dictionary {result['dictionary_ms']:.0f} ms" if "dictionary_ms" in result else ''
+        print(f"{workload}: process {result['process_ms']:.0f} ms, import {result['import_ms']:.0f} ms{extra}")
+        print(f"  {'command':<15}{'cold ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+        for cmd, s in result["commands"].items():
+            print(f"  {cmd:<15}{s['cold_ms']:>10.2f}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}"
+                  f"{s['p99_ms']:>10.3f}{s['ops_per_s'] or 0:>10.0f}")
+        if result.get("skipped"):
+            print(f"  skipped, no input: {', '.join(result['skipped'])}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    ap.add_argument("--real", action="store_true", help="benchmark the installed dictionary")
+    ap.add_argument("--synthetic", type=int, nargs="*", default=[], metavar="N",
+                    help="benchmark synthetic snapshots of N terms")
+    ap.add_argument("--commands", nargs="+", choices=COMMANDS, default=list(COMMANDS))
+    ap.add_argument("--iterations", type=int, default=200, help="warm calls per command")
+    ap.add_argument("--embed-latency", type=float, default=0.0,
+                    help="seconds added to every stub Ollama request")
+    ap.add_argument("--dim", type=int, default=256, help="synthetic embedding dimension")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--output", "-o", metavar="FILE", help="also write the JSON report to FILE")
+    ap.add_argument("--compare", metavar="FILE", help="JSON report of an earlier run")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="relative warm p50 slowdown reported as a regression")
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(json.loads(args.worker))))
+        return
+    if not args.real and not args.synthetic:
+        args.real = True
+
+    spec = {"commands": args.commands, "iterations": args.iterations, "seed": args.seed}
+    report = {"commit": _git_commit(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "machine": platform.machine(),
+              "params": {k: v for k, v in vars(args).items() if k not in ("worker", "json", "output", "compare")},
+              "workloads": {}}
+
+    if args.real:
+        from ieml_store import EmbeddingStore, store_exists
+        spec_real = {**spec, "dictionary": True}
+        if store_exists():
+            dim = EmbeddingStore().matrix.shape[1]
+        else:
+            dim = args.dim
+            spec_real["commands"] = [c for c in args.commands if c not in STORE_COMMANDS]
+        with _stub(args.embed_latency, dim) as url:
+            report["workloads"]["real"] = run_workload("real", {"OLLAMA_HOST": url}, os.getcwd(), spec_real)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.synthetic:
+            workdir = os.path.join(tmp, f"synthetic_{n}")
+            codes = synthetic_snapshot(os.path.join(workdir, "snapshot"), n, seed=args.seed)
+            if set(STORE_COMMANDS) & set(args.commands):
+                synthetic_store(workdir, codes, args.dim, seed=args.seed)
+            env = {"IEML_SNAPSHOT": os.path.join(workdir, "snapshot")}
+            with _stub(args.embed_latency, args.dim) as url:
+                report["workloads"][f"synthetic_{n}"] = run_workload(
+                    f"synthetic_{n}", {**env, "OLLAMA_HOST": url}, workdir, spec)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions (warm p50 > +{args.threshold:.0%}): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
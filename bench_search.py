@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Gloss search latency: linear substring scan versus the SearchIndex, for
+several query lengths, against the dictionary glosses or --synthetic N
+random glosses to check that indexed latency does not grow with
+dictionary size.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ieml_search import SearchIndex
+
+
+def linear_search(en_map, query):
+    return [(code, gloss) for code, gloss in en_map.items()
+            if gloss and query.lower() in gloss.lower()]
+
+
+def synthetic(n, vocabulary=20000, seed=0):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choices(letters, k=rng.randint(3, 10))) for _ in range(vocabulary)]
+    return {f"S{i}": " ".join(rng.choices(words, k=rng.randint(1, 4))) for i in range(n)}
+
+
+def timed(fn, queries, repeat):
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn(q)
+        times.append((time.perf_counter() - t0) / repeat)
+    times = np.array(times) * 1e6
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--synthetic", type=int, metavar="N", help="use N synthetic glosses")
+    ap.add_argument("--queries", type=int, default=50, help="queries per length")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--lengths", type=int, nargs="+", default=[1, 2, 3, 5, 8, 12])
+    args = ap.parse_args()
+
+    if args.synthetic:
+        en_map = synthetic(args.synthetic)
+    else:
+        from ieml_api import dic
+        en_map = {code: gloss for code, gloss in dic.translations.get("en", {}).items() if gloss}
+
+    t0 = time.perf_counter()
+    index = SearchIndex((code, gloss, None) for code, gloss in en_map.items())
+    print(f"{len(index)} glosses, index built in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    print(f"{'length':>6}{'hits':>8}{'linear p50 us':>16}{'index p50 us':>15}{'index p95 us':>15}")
+
+    rng = random.Random(0)
+    glosses = [g.lower() for g in en_map.values()]
+    for length in args.lengths:
+        # substrings of real glosses, so every query has at least one hit
+        pool = [g for g in glosses if len(g) >= length]
+        if not pool:
+            continue
+        queries = []
+        for g in rng.choices(pool, k=args.queries):
+            start = rng.randrange(len(g) - length + 1)
+            queries.append(g[start:start + length])
+
+        hits = np.mean([len(index.search(q)) for q in queries])
+        lin50, _ = timed(lambda q: linear_search(en_map, q), queries, args.repeat)
+        idx50, idx95 = timed(index.search, queries, args.repeat)
+        print(f"{length:>6}{hits:>8.0f}{lin50:>16.1f}{idx50:>15.1f}{idx95:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Cold start of the dictionary: the ieml pickle cache and version JSON versus
+the columnar snapshot. Every measurement runs in a fresh interpreter so
+nothing is shared between runs except the OS page cache.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+SETUP = "import time; t0 = time.perf_counter()\n"
+REPORT = "\nprint(time.perf_counter() - t0)\n"
+
+PATHS = {
+    # what ieml_api used to do on import
+    "dictionary": """
+from ieml.dictionary import Dictionary
+Dictionary()
+""",
+    # the two files behind it: version JSON and pickled Dictionary
+    "json+pickle": """
+from ieml.dictionary.version import get_default_dictionary_version, load_dictionary_from_cache
+v = get_default_dictionary_version()
+v.load()
+load_dictionary_from_cache(v)
+""",
+    # open the snapshot and touch every section the REPL commands read
+    "snapshot": """
+from ieml_snapshot import Snapshot
+snapshot = Snapshot({path!r})
+snapshot.codes.tolist(); snapshot.layers[:]; snapshot.neighbour_counts[:]
+snapshot.translations("en").tolist(); snapshot.relations
+""",
+    "snapshot (open)": """
+from ieml_snapshot import Snapshot
+Snapshot({path!r})
+""",
+}
+
+
+def measure(code, runs):
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", SETUP + code + REPORT],
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    # builds the snapshot on first use
+    path = subprocess.run([sys.executable, "-c", "from ieml_api import snapshot; print(snapshot.path)"],
+                          capture_output=True, text=True, check=True).stdout.strip()
+
+    results = {}
+    for name, code in PATHS.items():
+        try:
+            times = measure(code.format(path=path), args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"{name}: failed\n{e.stderr}", file=sys.stderr)
+            continue
+        results[name] = {"p50_ms": float(np.median(times)), "min_ms": float(np.min(times))}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'path':<18}{'p50 ms':>10}{'min ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<18}{r['p50_ms']:>10.1f}{r['min_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Export the neighbour graph of the current dictionary version as TSV or JSON
+lines, one edge (term, neighbour, relation types, neighbour gloss) per line.
+"""
+import argparse
+import json
+import sys
+
+from ieml_commands import neighbour_table
+from ieml_api import term_table
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("output", nargs="?", default="-", help="output file ('-' for stdout)")
+    ap.add_argument("--format", choices=("tsv", "jsonl"), default="tsv")
+    ap.add_argument("--type", help="comma separated relation types to keep")
+    ap.add_argument("--lang", default="en", help="gloss language")
+    args = ap.parse_args()
+
+    table = neighbour_table()
+    try:
+        mask = table.type_mask(args.type.split(",")) if args.type else None
+    except KeyError as e:
+        ap.error(f"unknown relation type {e}, expected one of {', '.join(table.types)}")
+    sources, targets, masks = table.edges(mask)
+
+    glosses = term_table.glosses(args.lang)
+    glosses = glosses.tolist() if glosses is not None else None
+    codes = term_table.codes
+    # the same few masks repeat over the whole graph
+    names = {int(m): ",".join(table.type_names(int(m))) for m in set(masks.tolist())}
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf8")
+    try:
+        if args.format == "tsv":
+            out.write("term\tneighbour\trelations\tgloss\n")
+        for s, t, m in zip(sources.tolist(), targets.tolist(), masks.tolist()):
+            gloss = glosses[t] if glosses is not None else ''
+            if args.format == "tsv":
+                out.write(f"{codes[s]}\t{codes[t]}\t{names[m]}\t{gloss}\n")
+            else:
+                out.write(json.dumps({"term": codes[s], "neighbour": codes[t],
+                                      "relations": names[m].split(","), "gloss": gloss},
+                                     ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {len(sources)} edges", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,142 +1,317 @@
 #!/usr/bin/env python3
 
+import argparse
+import json
 import logging
-import unicodedata
-from difflib import get_close_matches
-from ieml.dictionary import term, Dictionary
-from ieml_api import dic, term, adj_matrix
-from ieml_auto import reverse_ieml 
+import sys
+import time
+from collections import defaultdict
+import ieml_lazy
+from ieml_lazy import profile
+from ieml_terms import UNKNOWN_COMMAND, normalize_code
 
 
 
 
 logging.basicConfig(level=logging.INFO)
 
-def normalize_code(code_str):
-    # Normalize term codes. Apply Unicode NFKC, convert curly quotes and dashes.
-    s = unicodedata.normalize('NFKC', code_str)
-    s = s.replace('’', "'").replace('‘', "'")
-    s = s.replace('–', '-').replace('—', '-')
-    return s
-
-def parse_term(code):
-    try:
-        t = term(code)
-        code_str = str(t)
-        print(f"Term: {code_str}")
-        idx = getattr(t, 'index', None)
-        if idx is not None:
-            print(f"  Index:\t{idx}")
-        layer = getattr(t, 'layer', None)
-        if layer is not None:
-            print(f"  Layer:\t{layer}")
-        trans = getattr(t, 'translations', None)
-        if trans:
-            en = getattr(trans, 'en', None)
-            if en:
-                print(f"  English:\t{en}")
-        rels = getattr(t, 'relations', None)
-        neighs = getattr(rels, 'neighbours', None) if rels else None
-        if neighs is not None:
-            print(f"  Neighbours: {len(neighs)}")
-
-    except Exception as e:
-        print(f"Invalid IEML term: {e}")
-        # Fuzzy-search against all valid codes when term is invalid
-        all_codes = [str(term_obj) for term_obj in Dictionary().terms]
-        suggestions = get_close_matches(code, all_codes, n=5, cutoff=0.6)
-        if suggestions:
+def print_details(details):
+    if "error" in details:
+        print(details["error"])
+        if "suggestions" not in details:
+            return
+        if details["suggestions"]:
             print("Did you mean?:")
-            for s in suggestions:
+            for s in details["suggestions"]:
                 print(f"  • {s}")
         else:
             print("No close matches found.")
+        return
 
-def parse_by_index(index_str):
-    # Lookup a term by its numeric index and display details
-    try:
-        idx = int(index_str)
-    except ValueError:
-        print(f"Invalid index: {index_str}")
-        return
-    match = None
-    for t_obj in Dictionary().index:
-        if getattr(t_obj, 'index', None) == idx:
-            match = t_obj
-            break
-    if not match:
-        print(f"No term found with index {idx}")
+    print(f"Term: [{details['term']}]")
+    if "index" in details:
+        print(f"  Index:\t{details['index']}")
+    if "layer" in details:
+        print(f"  Layer:\t{details['layer']}")
+    if "english" in details:
+        print(f"  English:\t{details['english']}")
+    if "neighbours" in details:
+        print(f"  Neighbours: {details['neighbours']}")
+
+def print_index(result):
+    # Terms looked up by index (single, range or list)
+    if "terms" not in result:
+        print_details(result)
         return
-    parse_term(str(match))
 
-def list_neighbors(code):
-    try:
-        t = term(code)
-        neighs = getattr(t.relations, 'neighbours', [])
-        if not neighs:
-            print(f"No neighbours found for {code}")
-            return
+    rows = result["terms"]
+    if rows:
+        max_code_len = max(len(d["term"]) for d in rows)
+        max_idx_len = max(len(str(d["index"])) for d in rows)
+        for d in rows:
+            print(f"{d['index']:>{max_idx_len}}  {d['term']:<{max_code_len}}  {d.get('english', '')}")
+    if result["missing"]:
+        print(f"No term found with index {', '.join(map(str, result['missing']))}")
 
-        print(f"[{code}]")
-        neigh_list = []
-        for item in neighs:
-            nbr = item[0] if isinstance(item, (tuple, list)) else item
-            code_str = str(nbr)
-            trans = getattr(nbr, 'translations', None)
-            en = getattr(trans, 'en', None) if trans else None
-            en_str = f" ({en})" if en else ''
-            neigh_list.append((code_str, en_str))
+def print_neighbors(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    if not result["neighbours"]:
+        if result["total"]:
+            print(f"Page {result['page']} is past the last page ({result['pages']})")
+        else:
+            print(f"No neighbours found for {result['term']}")
+        return
 
-        max_len = max(len(code_str) for code_str, _ in neigh_list)
+    print(f"[{result['term']}]  {result['total']} neighbours, page {result['page']}/{result['pages']}")
+    neigh_list = [(n["code"], f" ({n['english']})" if n["english"] else '', ", ".join(n["relations"]))
+                  for n in result["neighbours"]]
 
-        for code_str, en_str in neigh_list:
-            padding = ' ' * (max_len - len(code_str))
-            print(f"{code_str}{padding}  {en_str}")
+    max_len = max(len(code_str) for code_str, _, _ in neigh_list)
+    max_en = max(len(en_str) for _, en_str, _ in neigh_list)
 
-    except Exception as e:
-        print(f"Error fetching neighbors: {e}")
+    for code_str, en_str, rel_str in neigh_list:
+        print(f"{code_str:<{max_len}}  {en_str:<{max_en}}  {rel_str}")
 
-def check_relation(code1, code2):
-    try:
-        t1 = term(code1)
-        t2 = term(code2)
-        exists = bool(adj_matrix[t1.index, t2.index])
-        print(f"{str(t1)} ↔ {str(t2)}: {exists}")
-    except Exception as e:
-        print(f"Error checking relation: {e}")
+def print_relation(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    print(f"{result['term1']} ↔ {result['term2']}: {result['related']}")
+    if result["path"] is None:
+        print("  Distance:\tunreachable")
+    else:
+        print(f"  Distance:\t{result['distance']}")
+        print(f"  Path:\t\t{' → '.join(result['path'])}")
 
-def search_by_english(query):
-    en_map = dic.translations.get('en', {})
-    if not en_map:
-        print("No English translations found in dic.translations['en']")
+def print_hops(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    if not result["terms"]:
+        print(f"No terms within {result['k']} hops of {result['term']}")
+        return
+
+    print(f"[{result['term']}] within {result['k']} hops")
+    max_len = max(len(t["code"]) for t in result["terms"])
+    for t in result["terms"]:
+        en_str = f" ({t['english']})" if t["english"] else ''
+        print(f"  {t['distance']}  {t['code']:<{max_len}}  {en_str}")
+
+def print_distances(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    width = max(len(t) for t in result["terms"])
+    cell = max(width, 3)
+    print(" " * width + "".join(f"  {t:>{cell}}" for t in result["terms"]))
+    for t, row in zip(result["terms"], result["distances"]):
+        cells = "".join(f"  {'-' if d is None else d:>{cell}}" for d in row)
+        print(f"{t:<{width}}{cells}")
+
+def print_search(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    enhanced = result["matches"]
+    if not enhanced:
+        print(f"No terms found matching '{result['query']}'")
         return
 
-    matches = [(code, gloss) for code, gloss in en_map.items()
-               if gloss and query.lower() in gloss.lower()]
+    max_code_len = max(len(m["code"]) for m in enhanced)
+    max_idx_len = max((len(str(m["index"])) for m in enhanced if m["index"] is not None), default=0)
 
+    for m in enhanced:
+        code_pad = ' ' * (max_code_len - len(m["code"]))
+        idx_str = str(m["index"]) if m["index"] is not None else ''
+        idx_pad = ' ' * (max_idx_len - len(idx_str))
+        print(f"{m['code']}{code_pad}  [{idx_str}]{idx_pad}  → {m['english']}")
+
+def print_semsearch(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    matches = result["matches"]
     if not matches:
-        print(f"No terms found matching '{query}'")
+        print(f"No terms found for '{result['query']}'")
+        return
+
+    max_code_len = max(len(m["code"]) for m in matches)
+    for m in matches:
+        lexical = f"  lexical {m['lexical']:.1f}" if m.get("lexical") is not None else ''
+        print(f"{m['score']:6.3f}  {m['code']:<{max_code_len}}  → {m['english']}{lexical}")
+
+def print_auto(result):
+    # Non-streamed `auto` answer, as returned by a server
+    if "error" in result:
+        print(result["error"])
+        return
+    max_len = max((len(g) for g in result["glosses"]), default=0)
+    print(result["concept"])
+    print("Candidates:")
+    for code, gloss in zip(result["candidates"], result["glosses"]):
+        print(f"    {gloss:<{max_len}} → {code}")
+    print("\nAuto suggestion:\n")
+    print(result["response"])
+    print()
+
+def print_dump(result):
+    if "error" in result:
+        print(result["error"])
+        return
+    where = f" of layer {result['layer']}" if result["layer"] is not None else ''
+    print(f"{result['count']} terms{where}")
+    if not result["terms"]:
         return
-    
-    enhanced = []
-    for code, gloss in matches:
+    max_code_len = max(len(t["code"]) for t in result["terms"])
+    max_idx_len = max(len(str(t["index"])) for t in result["terms"])
+    for t in result["terms"]:
+        glosses = "  ".join(t["glosses"][lang] for lang in result["languages"])
+        print(f"{t['index']:>{max_idx_len}}  {t['code']:<{max_code_len}}  {glosses}")
+
+RENDERERS = {
+    "parse": print_details,
+    "index": print_index,
+    "neighbors": print_neighbors,
+    "relation": print_relation,
+    "hops": print_hops,
+    "distances": print_distances,
+    "dump": print_dump,
+    "search": print_search,
+    "semsearch": print_semsearch,
+    "auto": print_auto,
+}
+
+def render(cmd, result):
+    if result.get("error") == UNKNOWN_COMMAND or cmd not in RENDERERS:
+        print("Unknown command. Type 'help' for a list of commands.")
+    else:
+        RENDERERS[cmd](result)
+
+def run_batch(lines, out, workers=4, concepts=False):
+    """
+    Run REPL command lines (or bare concepts for `auto` when `concepts`)
+    and write one JSON object per line to `out`:
+    {"line", "command", "args", "result"}. `search` commands share the
+    prebuilt gloss index, `semsearch` queries with the same options are
+    embedded and ranked together and `auto` runs on a pool of `workers`, so
+    results are grouped by command; use "line" to restore input order.
+    """
+    from ieml_commands import (AUTO_K, parse_auto_args, parse_semsearch_args, run_command, search_english_many,
+                               semantic_search_many)
+
+    jobs = defaultdict(list)
+    # (k, hybrid) -> [(lineno, args, query)]
+    semsearch = defaultdict(list)
+    # k -> [(lineno, args, concept)]
+    auto = defaultdict(list)
+    for lineno, raw in enumerate(lines, 1):
+        raw = normalize_code(raw).strip()
+        if not raw:
+            continue
+        if concepts:
+            auto[AUTO_K].append((lineno, [raw], raw))
+            continue
+        parts = raw.split()
+        cmd = parts[0].lower()
+        # without a query they are run (and rejected) like any other line
+        if cmd == "search" and len(parts) > 1:
+            jobs[cmd].append((lineno, parts[1:]))
+            continue
+        if cmd == "auto":
+            try:
+                k, concept = parse_auto_args(parts[1:])
+            except ValueError:
+                concept = None
+            if concept:
+                auto[k].append((lineno, parts[1:], concept))
+                continue
+        if cmd == "semsearch":
+            try:
+                k, hybrid, query = parse_semsearch_args(parts[1:])
+            except ValueError:
+                query = None
+            if query:
+                semsearch[k, hybrid].append((lineno, parts[1:], query))
+                continue
+        jobs["other"].append((lineno, raw))
+
+    timings = defaultdict(lambda: [0, 0.0])
+
+    def emit(lineno, cmd, args, result):
+        out.write(json.dumps({"line": lineno, "command": cmd, "args": args, "result": result},
+                             ensure_ascii=False) + "\n")
+
+    if jobs["search"]:
+        start = time.perf_counter()
+        results = search_english_many([" ".join(args) for _, args in jobs["search"]])
+        for (lineno, args), result in zip(jobs["search"], results):
+            emit(lineno, "search", args, result)
+        timings["search"][0] += len(results)
+        timings["search"][1] += time.perf_counter() - start
+
+    for (k, hybrid), group in semsearch.items():
+        start = time.perf_counter()
+        results = semantic_search_many([query for _, _, query in group], k, hybrid)
+        for (lineno, args, _), result in zip(group, results):
+            emit(lineno, "semsearch", args, result)
+        timings["semsearch"][0] += len(results)
+        timings["semsearch"][1] += time.perf_counter() - start
+
+    for lineno, raw in jobs["other"]:
+        start = time.perf_counter()
+        cmd, args, result = run_command(raw)
+        emit(lineno, cmd, args, result)
+        timings[cmd][0] += 1
+        timings[cmd][1] += time.perf_counter() - start
+
+    for k, group in auto.items():
+        start = time.perf_counter()
+        done = 0
         try:
-            t = term(code)
-            idx = getattr (t, 'index', None)
-        except Exception:
-            idx = None
-        enhanced.append((code, idx, gloss))
-
-    max_code_len = max(len(code) for code, _, _ in enhanced)
-    max_idx_len = max(len(str(idx)) for _, idx, _ in enhanced if idx is not None)
-
-    for code, idx, gloss in sorted(enhanced, key=lambda x: x[0]):
-        code_pad = ' ' * (max_code_len - len(code))
-        idx_str = str(idx) if idx is not None else ''
-        idx_pad = ' ' * (max_idx_len - len(idx_str))
-        print(f"{code}{code_pad}  [{idx_str}]{idx_pad}  → {gloss}")
+            from ieml_pipeline import auto_batch
+            for (lineno, args, _), result in zip(group, auto_batch([c for _, _, c in group], k,
+                                                                   concurrency=workers)):
+                emit(lineno, "auto", args, result)
+                done += 1
+        except Exception as e:
+            # the lines not answered yet get error records, the other groups keep theirs
+            for lineno, args, concept in group[done:]:
+                emit(lineno, "auto", args, {"concept": concept, "error": f"auto failed: {e}"})
+        timings["auto"][0] += len(group)
+        timings["auto"][1] += time.perf_counter() - start
+
+    for cmd, (count, elapsed) in timings.items():
+        rate = count / elapsed if elapsed else float("inf")
+        print(f"{cmd:<10} {count:>6} commands  {elapsed:8.2f} s  {rate:8.1f}/s", file=sys.stderr)
+
+def profile_startup(out=sys.stderr):
+    # Time to the prompt, then the cost of each subsystem the commands create on first use
+    import ieml_commands
+    profile.add("ready for input", time.perf_counter() - profile.start)
+    print("Startup:", file=out)
+    profile.report(out)
+
+    profile.phases.clear()
+    with profile.phase("import ieml_auto"):
+        ieml_commands.import_auto()
+    ieml_lazy.load_all()
+    print("\nOn first use:", file=out)
+    profile.report(out)
 
-def repl():
+def repl(warm=True, remote=None):
+    """
+    Interactive loop. Commands run in this process, or on the server behind
+    `remote` (an ieml_client.RemoteREPL) when given.
+    """
+    if remote is not None:
+        run_command = remote.run_command
+    else:
+        from ieml_commands import import_auto, run_command
+        if warm:
+            # the dictionary itself is only needed for non-canonical term spellings
+            ieml_lazy.warm(before=import_auto, exclude=("dictionary",))
     print("IEML REPL")
     print("Type 'help' for commands and 'exit' to quit.")
     while True:
@@ -155,29 +330,78 @@ def repl():
         if cmd == "help":
             print("Commands:")
             print("  parse <TERM>               Validate & show term details")
-            print("  index <NUM>                Get term by index number")
-            print("  neighbors <TERM>           List semantic neighbors")
+            print("  index <NUM|A-B|A,B,..>     Get term(s) by index number")
+            print("  neighbors <TERM> [page=N] [type=T,..]")
+            print("                             List semantic neighbors, 50 per page")
             print("  relation <TERM1> <TERM2>   Compute semantic relation distance")
+            print("  hops <TERM> [K]            List terms within K relation hops (default 2)")
+            print("  distances <TERM> <TERM>..  Relation distance between every pair of terms")
+            print("  dump [layer=N] [lang=L,..] List every term (of a layer) with its glosses")
             print("  search <TERM>              Search the dictionary for a term in natural language")
-            print("  auto <TERM>                Automatically distill concept using AI")
+            print("  semsearch [k=N] [mode=semantic|hybrid] <TEXT>")
+            print("                             Rank terms by gloss embedding similarity")
+            print("  auto [k=N] <TERM>          Automatically distill concept using AI")
             print("  exit                       Quit the REPL")
-        elif cmd == "parse" and len(args) == 1:
-            parse_term(args[0])
-        elif cmd == "index" and len(args) == 1:
-            parse_by_index(args[0])
-        elif cmd in ("neighbours", "neighbors") and len(args) == 1:
-            list_neighbors(args[0])
-        elif cmd in ("relation") and len(args) == 2:
-            check_relation(args[0], args[1])
         elif cmd == "exit":
             print("Goodbye!")
             break
-        elif cmd == "search" and len(args) >= 1:
-            search_by_english(" ".join(args))
-        elif cmd == "auto" and args:
-            reverse_ieml(" ".join(args))
+        elif cmd == "auto" and args and remote is None:
+            # streamed locally, the server answers in one piece
+            from ieml_commands import parse_auto_args
+            try:
+                k, concept = parse_auto_args(args)
+            except ValueError as e:
+                print(e)
+                continue
+            if not concept:
+                print(UNKNOWN_COMMAND)
+                continue
+            from ieml_auto import reverse_ieml
+            reverse_ieml(concept, k=k)
         else:
-            print("Unknown command. Type 'help' for a list of commands.")
+            try:
+                cmd, _, result = run_command(raw)
+            except OSError as e:
+                print(f"Server unreachable: {e}")
+                continue
+            render(cmd, result)
+
+def main():
+    ap = argparse.ArgumentParser(description="IEML REPL")
+    ap.add_argument("--batch", metavar="FILE",
+                    help="run the commands in FILE ('-' for stdin) and write JSON lines")
+    ap.add_argument("--concepts", action="store_true",
+                    help="with --batch, every line is a concept for auto")
+    ap.add_argument("--output", "-o", metavar="FILE", help="JSON lines output (default stdout)")
+    ap.add_argument("--workers", type=int, default=4, help="concurrent auto generations")
+    ap.add_argument("--no-warm", action="store_true",
+                    help="do not load the indexes and LLM client in the background")
+    ap.add_argument("--connect", metavar="URL",
+                    help="send commands to a running ieml_server.py instead of loading the dictionary")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="print how long startup and each lazily loaded subsystem take, then exit")
+    args = ap.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+        return
+    if args.connect:
+        from ieml_client import RemoteREPL
+        repl(remote=RemoteREPL(args.connect))
+        return
+    if args.batch is None:
+        repl(warm=not args.no_warm)
+        return
+
+    src = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf8")
+    out = open(args.output, "w", encoding="utf8") if args.output else sys.stdout
+    try:
+        run_batch(src, out, workers=args.workers, concepts=args.concepts)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
 
 if __name__ == "__main__":
-    repl()
+    main()
@@ -1,4 +1,95 @@
-from ieml.dictionary import term, Dictionary
+import logging
+import os
+import pickle
 
-dic = Dictionary()
-adj_matrix = dic.relations_graph.connexity
\ No newline at end of file
+from ieml_lazy import lazy, profile
+
+with profile.phase("import ieml"):
+    from ieml.dictionary import Dictionary
+    from ieml.dictionary.version import VERSIONS_FOLDER, get_default_dictionary_version
+from ieml_snapshot import Snapshot, write_snapshot
+from ieml_terms import TermTable
+
+logger = logging.getLogger(__name__)
+
+# A snapshot directory to use instead of the one of the installed dictionary
+# version (benchmark workloads)
+SNAPSHOT_PATH = os.environ.get("IEML_SNAPSHOT")
+
+# The default version is only looked up when needed: never with SNAPSHOT_PATH
+# set, so that synthetic workloads run without any installed version
+_version = lazy("dictionary version", get_default_dictionary_version)
+
+# The full Dictionary is only built by commands that need the ieml objects
+_dictionary = lazy("dictionary", lambda: Dictionary(get_version()))
+
+
+def get_version():
+    return _version.get()
+
+
+def get_dictionary():
+    return _dictionary.get()
+
+
+def __getattr__(name):
+    # `version`, `dic` and `adj_matrix` stay importable but are created on first access
+    if name == "version":
+        return get_version()
+    if name == "dic":
+        return get_dictionary()
+    if name == "adj_matrix":
+        return get_dictionary().relations_graph.connexity
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def version_cache_path(kind, version=None, ext="pk1"):
+    # Named like DictionaryVersion.cache: <kind>_<version>.pk1 in the versions folder
+    version_str = str(version or get_version())
+    if os.name == 'nt':
+        version_str = version_str.replace(':', '-')
+    name = f"{kind}_{version_str}.{ext}" if ext else f"{kind}_{version_str}"
+    return os.path.join(VERSIONS_FOLDER, name)
+
+
+def cached_for_version(kind, build):
+    """
+    Return the structure `build()` computed for the current dictionary
+    version, loading it from the snapshot directory when it was built
+    before. Kept inside the snapshot, it is dropped whenever the snapshot
+    is rewritten (e.g. on a format change).
+    """
+    path = os.path.join(snapshot.path, f"{kind}.pk1")
+    if os.path.isfile(path):
+        try:
+            with open(path, 'rb') as fp:
+                return pickle.load(fp)
+        except Exception as e:
+            logger.warning("Rebuilding unreadable %s (%s)", path, e)
+
+    obj = build()
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as fp:
+        pickle.dump(obj, fp, protocol=4)
+    os.replace(tmp, path)
+    return obj
+
+
+def load_snapshot():
+    if SNAPSHOT_PATH:
+        return Snapshot(SNAPSHOT_PATH)
+    path = version_cache_path("snapshot", ext=None)
+    if os.path.isdir(path):
+        try:
+            return Snapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Rewriting snapshot %s (%s)", path, e)
+    logger.info("Writing dictionary snapshot to %s", path)
+    write_snapshot(get_dictionary(), path)
+    return Snapshot(path)
+
+
+with profile.phase("snapshot"):
+    snapshot = load_snapshot()
+with profile.phase("term table"):
+    term_table = TermTable(snapshot)
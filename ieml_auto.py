@@ -1,61 +1,122 @@
 import json
-import textwrap
-import re
+import os
 import numpy as np
 import logging
-from sklearn.neighbors import NearestNeighbors
-from ollama import Client
-from ieml_api import dic, term
+import time
+from collections import deque
+from itertools import islice
+from ieml_api import term_table
+from ieml_lazy import lazy
+from ieml_retrieval import CandidateRetriever, RetrievalStats, clean_code, validate_codes
+from ieml_index import build_index, index_path, load_index
+from ieml_cache import CACHE_PATH, EmbeddingCache, ResponseCache, normalize_text
+from ieml_store import STORE_PREFIX, EmbeddingStore, matrix_path, store_exists
+from ieml_semsearch import SemanticSearch
 
 # Ollama setup
-client = Client()
 EMBED_MODEL = "nomic-embed-text"
 COMP_MODEL = "gemma3"
 
-# Load embeddings 
-_data = np.load("gloss_embeddings.npz", allow_pickle=True)
-_codes = _data["codes"].tolist()
-_gloss_embeddings = _data["embeddings"].astype(float)
-_nbrs = NearestNeighbors(n_neighbors=min(len(_codes), 32),
-                         metric="cosine", algorithm="brute")
-_nbrs.fit(_gloss_embeddings)
+logger = logging.getLogger(__name__)
 
 
-def _clean_code(c: str) -> str:
-    return c.strip(" ,\"'")
+def _make_client():
+    from ollama import Client
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return Client()
 
 
-def top_primitives(concept: str, k: int = 15) -> list[str]:
-    valid = []
-    attempted = set()
-    offset = 0
+_client = lazy("llm client", _make_client)
 
-    while len(valid) < k and offset < len(_codes):
-        resp = client.embed(model=EMBED_MODEL, input=[concept])
-        vec = np.array(resp.embeddings, dtype=float).reshape(1, -1)
 
-        _, idxs = _nbrs.kneighbors(vec, n_neighbors=len(_codes))
-        raw = [_codes[i] for i in idxs[0][offset:]]
+def _load_embeddings():
+    """
+    Load embeddings: memory-mapped store, legacy npz as a fallback.
+    :return: (path, codes, valid mask, matrix, normalized)
+    """
+    if store_exists(STORE_PREFIX):
+        store = EmbeddingStore(STORE_PREFIX)
+        return matrix_path(STORE_PREFIX), store.clean_codes, store.valid, store.matrix, True
 
-        for rc in raw:
-            code = _clean_code(rc)
-            if code in attempted:
-                continue
-            attempted.add(code)
-            try:
-                term(code)
-                valid.append(code)
-                if len(valid) == k:
-                    break
-            except:
-                continue
-        offset += len(raw)
+    path = "gloss_embeddings.npz"
+    logger.warning("Loading legacy %s, run migrate_embeddings.py to convert it", path)
+    data = np.load(path, allow_pickle=True)
+    if "valid" in data.files:
+        codes, valid = data["clean_codes"].tolist(), data["valid"]
+    else:
+        # embeddings baked before the validation step, validate once here
+        codes, valid = validate_codes(data["codes"].tolist())
+    return path, codes, valid, data["embeddings"], False
 
-    return valid[:k]
 
-def compose_ieml_raw(concept: str, candidates: list[str]) -> str:
-    en_map = dic.translations.get("en", {})
-    primitives = [{"code": c, "gloss": en_map.get(c, '')} for c in candidates]
+def _embed_remote(concept: str):
+    resp = _client.get().embed(model=EMBED_MODEL, input=[concept])
+    return resp.embeddings[0]
+
+
+embed_cache = EmbeddingCache(CACHE_PATH) if CACHE_PATH else None
+response_cache = ResponseCache(CACHE_PATH) if CACHE_PATH else None
+
+# Part of the response cache key, bump it whenever build_prompt changes
+PROMPT_VERSION = 1
+
+
+def _embed_concept(concept: str):
+    if embed_cache is None:
+        return _embed_remote(concept)
+    return embed_cache.embed(EMBED_MODEL, concept, _embed_remote)
+
+
+def _make_retriever():
+    path, codes, valid, matrix, normalized = _load_embeddings()
+    # Vector index baked next to the embeddings, exact flat search otherwise
+    if os.path.isfile(index_path(path)):
+        index = load_index(index_path(path), matrix, normalized=normalized)
+    else:
+        index = build_index(matrix, "flat", normalized=normalized)
+    return CandidateRetriever(codes, index, valid, embed=_embed_concept)
+
+
+_retriever = lazy("embedding index", _make_retriever)
+
+
+def _make_semantic_search():
+    retriever = _retriever.get()
+    return SemanticSearch(retriever.codes, retriever.index, retriever.valid)
+
+
+_semantic_search = lazy("semantic search", _make_semantic_search)
+
+
+def semantic_search_many(queries: list[str], k: int = 10, lexical=None) -> list:
+    # Embed all queries in one request, rank them with one matrix product
+    return _semantic_search.get().search_many(queries, embed_concepts(queries), k, lexical)
+
+
+def embed_concepts(concepts: list[str]) -> list:
+    # Embed many concepts in a single request, skipping cached ones
+    vectors = [embed_cache.get(EMBED_MODEL, c) if embed_cache is not None else None
+               for c in concepts]
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    if missing:
+        resp = _client.get().embed(model=EMBED_MODEL, input=[concepts[i] for i in missing])
+        for i, vec in zip(missing, resp.embeddings):
+            vectors[i] = vec
+            if embed_cache is not None:
+                embed_cache.put(EMBED_MODEL, concepts[i], vec)
+    return vectors
+
+
+def top_primitives(concept: str, k: int = 15, vec=None) -> list[str]:
+    stats = RetrievalStats()
+    valid = list(islice(_retriever.get().candidates(concept, vec=vec, stats=stats), k))
+    logger.debug("top_primitives(%r): %d embed call(s), %d rows scored, embed cache %s",
+                 concept, stats.embed_calls, stats.rows_scored,
+                 embed_cache.stats() if embed_cache else "off")
+    return valid
+
+def build_prompt(concept: str, candidates: list[str]) -> str:
+    primitives = [{"code": c, "gloss": term_table.gloss(c)} for c in candidates]
 
     prompt = f"""
 You are an IEML expert. Given the concept and primitives provided, select any number of primitives necessary
@@ -93,30 +154,156 @@ Response format examples and explanation:
 
 """
 
-    resp_obj = client.generate(model=COMP_MODEL, prompt=prompt)
-    return resp_obj.dict().get("response", "")
+    return prompt
 
 
-import textwrap
+def compose_ieml_raw(concept: str, candidates: list[str]) -> str:
+    prompt = build_prompt(concept, candidates)
+
+    def generate():
+        resp_obj = _client.get().generate(model=COMP_MODEL, prompt=prompt)
+        return resp_obj.dict().get("response", "")
+
+    if response_cache is None:
+        return generate()
+    key = ResponseCache.key(COMP_MODEL, PROMPT_VERSION, normalize_text(concept), sorted(candidates))
+    return response_cache.get_or_compute(key, generate)
+
+
+class SelectionParser:
+    """
+    Incremental parser for the model's JSON selection. Text is fed as it
+    streams in; every complete top-level `{...}` object is decoded as soon as
+    its closing brace arrives.
+    """
+    def __init__(self, candidates):
+        self.candidates = set(candidates)
+        self.valid = []
+        self.invalid = []
+        self._buf = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> list[dict]:
+        found = []
+        for ch in text:
+            if self._depth:
+                self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == "{":
+                if not self._depth:
+                    self._buf = [ch]
+                self._depth += 1
+            elif ch == "}" and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    obj = self._decode("".join(self._buf))
+                    if obj is not None:
+                        found.append(obj)
+        return found
+
+    def _decode(self, text):
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            return None
+        code = clean_code(str(obj.get("code", "")))
+        # the model may only pick among the (already validated) candidates
+        (self.valid if code in self.candidates else self.invalid).append(code)
+        return obj
+
+
+def compose_selection(concept: str, candidates: list[str]) -> dict:
+    # Non-streamed answer of the model, with the selection parsed out of it
+    response = compose_ieml_raw(concept, candidates)
+    parser = SelectionParser(candidates)
+    parser.feed(response)
+    return {"concept": concept, "candidates": candidates,
+            "response": response, "selection": parser.valid}
 
-def reverse_ieml(concept: str):
-    logging.getLogger("httpx").setLevel(logging.WARNING)
 
-    cands = top_primitives(concept)
-    en_map = dic.translations.get("en", {})
+def auto_concept(concept: str, k: int = 15) -> dict:
+    """
+    Data side of `auto` for one concept, as returned to batch and server
+    clients: compose_selection plus the gloss of every candidate.
+    """
+    try:
+        result = compose_selection(concept, top_primitives(concept, k))
+    except Exception as e:
+        return {"concept": concept, "error": f"auto failed: {e}"}
+    result["glosses"] = [term_table.gloss(code) for code in result["candidates"]]
+    return result
 
-    glosses = [en_map.get(code, '') for code in cands]
+
+# Time from sending the prompt to the first streamed token, in milliseconds
+first_token_ms = deque(maxlen=1000)
+
+
+def stream_ieml_raw(concept: str, candidates: list[str]):
+    """
+    Like compose_ieml_raw, but yield the response text as the model
+    produces it. A cached response is yielded in one piece.
+    """
+    key = ResponseCache.key(COMP_MODEL, PROMPT_VERSION, normalize_text(concept), sorted(candidates))
+    cached = response_cache.get(key) if response_cache is not None else None
+    if cached is not None:
+        yield cached
+        return
+
+    start = time.perf_counter()
+    parts = []
+    first_token_seen = False
+    for chunk in _client.get().generate(model=COMP_MODEL, prompt=build_prompt(concept, candidates), stream=True):
+        text = chunk.response or ""
+        # chunks may be empty (e.g. before the first token), `parts` is no guide
+        if text and not first_token_seen:
+            first_token_seen = True
+            first_token_ms.append((time.perf_counter() - start) * 1000)
+            logger.debug("first token after %.0f ms", first_token_ms[-1])
+        parts.append(text)
+        yield text
+
+    if response_cache is not None:
+        response_cache.put(key, "".join(parts))
+
+
+def reverse_ieml(concept: str, stream: bool = True, k: int = 15):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    cands = top_primitives(concept, k)
+    glosses = [term_table.gloss(code) for code in cands]
     max_len = max((len(g) for g in glosses), default=0)
 
     print(f"{concept}")
     print("Candidates:")
     for code, gloss in zip(cands, glosses):
-        print(f"    {gloss:<{max_len}} → {code}")
-
-    raw = compose_ieml_raw(concept, cands)
-    print("\nAuto suggestion:\n")
-    print(raw)
-    print()
+        print(f"    {gloss:<{max_len}} → {code}", flush=stream)
 
-    return raw
+    print("\nAuto suggestion:\n", flush=stream)
+    parser = SelectionParser(cands)
+    if not stream:
+        raw = compose_ieml_raw(concept, cands)
+        parser.feed(raw)
+        print(raw)
+        print()
+    else:
+        parts = []
+        for text in stream_ieml_raw(concept, cands):
+            parts.append(text)
+            parser.feed(text)
+            print(text, end="", flush=True)
+        print("\n")
+        raw = "".join(parts)
+        if parser.invalid:
+            print(f"Ignored codes not among the candidates: {', '.join(parser.invalid)}\n")
 
+    return {"concept": concept, "candidates": cands, "response": raw, "selection": parser.valid}
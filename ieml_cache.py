@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+
+import numpy as np
+
+# IEML_CACHE="" disables the on-disk caches
+CACHE_PATH = os.environ.get("IEML_CACHE", os.path.join(os.path.expanduser("~"), ".ieml_repl_cache.sqlite"))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+class _SQLiteCache:
+    """
+    Shared plumbing for the on-disk caches: one connection per thread, WAL
+    journal so several REPL processes can read while one writes.
+    """
+    def __init__(self, path, schema):
+        self.path = path
+        self._schema = schema
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        self._conn()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._schema)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 3)}
+
+
+class EmbeddingCache(_SQLiteCache):
+    """
+    Disk-backed LRU cache of query embeddings keyed by (model, normalized
+    text). Vectors are stored as float32 blobs; a write that takes the table
+    past `max_entries` rows evicts the least recently used ones. Rows written
+    by other processes are only seen at the next count.
+    """
+    def __init__(self, path=CACHE_PATH, max_entries=100_000):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                used REAL NOT NULL,
+                PRIMARY KEY (model, text));
+            CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used);""")
+        self.max_entries = max_entries
+        # writes left before the table may exceed the bound, 0 until counted
+        self._room = 0
+        self._room_lock = threading.Lock()
+
+    def get(self, model, text):
+        key = normalize_text(text)
+        conn = self._conn()
+        row = conn.execute("SELECT vector FROM embeddings WHERE model = ? AND text = ?",
+                           (model, key)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+        conn.execute("UPDATE embeddings SET used = ? WHERE model = ? AND text = ?",
+                     (time.time(), model, key))
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def put(self, model, text, vector):
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO embeddings (model, text, vector, used) VALUES (?, ?, ?, ?)",
+                     (model, normalize_text(text), blob, time.time()))
+        # counting rows is not free, only count again once the writes since
+        # the last count could have taken the table past the bound
+        with self._room_lock:
+            self._room -= 1
+            if self._room < 0:
+                self._room = self.max_entries - self._evict(conn)
+
+    def _evict(self, conn):
+        # :return: the number of rows left
+        (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_entries:
+            conn.execute("DELETE FROM embeddings WHERE rowid IN "
+                         "(SELECT rowid FROM embeddings ORDER BY used LIMIT ?)",
+                         (count - self.max_entries,))
+            count = self.max_entries
+        return count
+
+    def embed(self, model, text, compute):
+        """
+        Return the cached vector for `text`, calling `compute(text)` and
+        storing its result on a miss.
+        """
+        vec = self.get(model, text)
+        if vec is None:
+            vec = np.asarray(compute(text), dtype=np.float32)
+            self.put(model, text, vec)
+        return vec
+
+
+class ResponseCache(_SQLiteCache):
+    """
+    Content-addressed cache of LLM responses with a time-to-live and a bound
+    on the number of entries. Concurrent requests for the same key within a
+    process are coalesced so only one of them runs the generation.
+    """
+    def __init__(self, path=CACHE_PATH, ttl=7 * 24 * 3600, max_entries=20_000):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                used REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS responses_used ON responses (used);""")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.coalesced = 0
+        self._puts = 0
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf8")).hexdigest()
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and now - row[1] > self.ttl:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+        self._count(row is not None)
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO responses (key, response, created, used) VALUES (?, ?, ?, ?)",
+                     (key, response, now, now))
+        self._puts += 1
+        if self._puts % 32 == 1:
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                conn.execute("DELETE FROM responses WHERE key IN "
+                             "(SELECT key FROM responses ORDER BY used LIMIT ?)",
+                             (count - self.max_entries,))
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached response for `key`. On a miss the first caller runs
+        `compute()` and stores the result; callers arriving meanwhile wait for
+        it instead of starting their own.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            response = compute()
+            self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def stats(self):
+        return {**super().stats(), "coalesced": self.coalesced}
@@ -0,0 +1,35 @@
+"""
+Thin client for ieml_server: sends REPL command lines, gets the same result
+dicts run_command returns locally. Needs nothing but the standard library.
+"""
+import json
+import urllib.error
+import urllib.request
+
+
+class RemoteREPL:
+    def __init__(self, url, timeout=300):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf8") if payload is not None else None
+        req = urllib.request.Request(self.url + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return json.loads(e.read() or b"{}")
+
+    def health(self):
+        return self._request("/health")
+
+    def run_command(self, line):
+        """
+        Same contract as ieml_commands.run_command: (command, args, result dict).
+        """
+        reply = self._request("/command", {"line": line})
+        if "result" not in reply:
+            return None, [], {"error": reply.get("error", "Bad reply from server")}
+        return reply["command"], reply["args"], reply["result"]
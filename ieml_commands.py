@@ -0,0 +1,335 @@
+"""
+Data side of the REPL commands. Each function returns a plain dict (JSON
+serializable) and never prints; ieml-repl.py formats them for the terminal,
+batch mode writes them as JSON lines.
+"""
+import threading
+
+from ieml_api import cached_for_version, term_table
+from ieml.dictionary import term
+from ieml_fuzzy import FuzzyIndex
+from ieml_lazy import lazy
+from ieml_neighbours import NeighbourTable, PAGE_SIZE
+from ieml_relations import RelationGraph
+from ieml_search import SearchIndex
+from ieml_terms import UNKNOWN_COMMAND, normalize_code, parse_index_spec
+
+
+# Candidate primitives offered to the model by `auto`
+AUTO_K = 15
+
+
+def import_auto():
+    # declares the embedding index and LLM client subsystems, for warm()
+    import ieml_auto
+
+
+# The ieml script parser keeps state between calls, serialize its use
+_parser_lock = threading.Lock()
+
+
+def _resolve(code):
+    # Term index of `code`; non-canonical spellings go through the ieml parser
+    idx = term_table.index_of(code)
+    if idx is None:
+        with _parser_lock:
+            idx = term(code).index
+    return idx
+
+
+def term_details(code):
+    try:
+        idx = _resolve(code)
+    except Exception as e:
+        # Fuzzy-search against all valid codes when term is invalid
+        return {"code": code,
+                "error": f"Invalid IEML term: {e}",
+                "suggestions": fuzzy_index().suggest(code, n=5, cutoff=0.6)}
+    return term_table.details(idx)
+
+
+_fuzzy_index = lazy("fuzzy index",
+                    lambda: cached_for_version("fuzzy", lambda: FuzzyIndex.from_table(term_table)))
+
+
+def fuzzy_index():
+    return _fuzzy_index.get()
+
+
+def term_by_index(index_spec):
+    """
+    Lookup terms by numeric index: a single index gives the term details,
+    a range ("10-50") or list ("1,5,7") gives {"terms": [...], "missing": [...]}.
+    """
+    try:
+        indices = parse_index_spec(index_spec, limit=len(term_table))
+    except ValueError as e:
+        return {"error": f"Invalid index {index_spec}: {e}"}
+
+    selected = term_table.select(indices)
+    if len(indices) == 1:
+        idx, code = selected[0]
+        if code is None:
+            return {"error": f"No term found with index {idx}"}
+        return term_table.details(idx)
+
+    return {"terms": [term_table.details(idx) for idx, code in selected if code is not None],
+            "missing": [idx for idx, code in selected if code is None]}
+
+
+_neighbour_table = lazy("neighbour table", lambda: NeighbourTable(term_table.snapshot))
+
+
+def neighbour_table():
+    return _neighbour_table.get()
+
+
+def parse_neighbour_options(args):
+    # "page=N" and "type=NAME[,NAME..]" options of the neighbors command
+    options = {}
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        if not sep or key not in ("page", "type"):
+            raise ValueError(f"unknown option {arg}")
+        if key == "page" and not (value.isdigit() and int(value) >= 1):
+            raise ValueError(f"page must be a positive number, got {value}")
+        options[key] = int(value) if key == "page" else value.split(",")
+    return options
+
+
+def term_neighbors(code, page=1, types=None, page_size=PAGE_SIZE):
+    """
+    One page of the neighbours of `code`, optionally restricted to some
+    relation types.
+    """
+    table = neighbour_table()
+    try:
+        idx = _resolve(code)
+        mask = table.type_mask(types) if types else None
+    except KeyError as e:
+        return {"term": code, "error": f"Unknown relation type {e}, expected one of {', '.join(table.types)}"}
+    except Exception as e:
+        return {"term": code, "error": f"Error fetching neighbors: {e}"}
+
+    indices, masks, total = table.page(idx, page, page_size, mask)
+    glosses = term_table.glosses("en")
+    neigh_list = [{"code": term_table[n], "index": int(n),
+                   "english": str(glosses[n]) if glosses is not None else '',
+                   "relations": table.type_names(int(m))}
+                  for n, m in zip(indices, masks)]
+    return {"term": term_table[idx], "neighbours": neigh_list, "total": total,
+            "page": page, "pages": max(1, -(-total // page_size))}
+
+
+_relation_graph = lazy("relation graph", lambda: RelationGraph.from_snapshot(term_table.snapshot))
+
+
+def relation_graph():
+    return _relation_graph.get()
+
+
+def term_relation(code1, code2):
+    try:
+        i, j = _resolve(code1), _resolve(code2)
+    except Exception as e:
+        return {"error": f"Error checking relation: {e}"}
+    path = relation_graph().path(i, j)
+    return {"term1": term_table[i], "term2": term_table[j],
+            "related": term_table.snapshot.related(i, j),
+            "distance": len(path) - 1 if path is not None else None,
+            "path": [term_table[p] for p in path] if path is not None else None}
+
+
+def term_hops(code, k="2"):
+    # Terms within k relation hops of `code`
+    try:
+        i = _resolve(code)
+        k = int(k)
+    except Exception as e:
+        return {"term": code, "error": f"Error computing neighbourhood: {e}"}
+    return {"term": term_table[i], "k": k,
+            "terms": [{"code": term_table[n], "distance": d, "english": term_table.gloss(term_table[n])}
+                      for n, d in relation_graph().k_hop(i, k)]}
+
+
+def term_distances(codes):
+    # All-pairs relation distances between a few terms (None when unreachable)
+    try:
+        nodes = [_resolve(code) for code in codes]
+    except Exception as e:
+        return {"error": f"Error computing distances: {e}"}
+    dist = relation_graph().pairwise(nodes)
+    return {"terms": [term_table[n] for n in nodes],
+            "distances": [[int(d) if d >= 0 else None for d in row] for row in dist]}
+
+
+# Built once per dictionary version and persisted next to its cache
+_search_index = lazy("search index",
+                     lambda: cached_for_version("search", lambda: SearchIndex.from_table(term_table)))
+
+
+def search_index():
+    return _search_index.get()
+
+
+def parse_dump_options(args):
+    # "layer=N" and "lang=L[,L..]" options of the dump command
+    options = {}
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        if not sep or key not in ("layer", "lang"):
+            raise ValueError(f"unknown option {arg}")
+        if key == "layer" and not value.isdigit():
+            raise ValueError(f"layer must be a number, got {value}")
+        options[key] = int(value) if key == "layer" else value.split(",")
+    return options
+
+
+def dump_terms(layer=None, langs=("en",)):
+    """
+    Every term, or every term of `layer`, with its glosses in `langs`, read
+    as whole columns of the term table.
+    """
+    try:
+        columns = term_table.columns(term_table.where(layer), langs)
+    except KeyError as e:
+        return {"error": f"Unknown language {e}, expected one of {', '.join(term_table.languages)}"}
+
+    rows = zip(*(columns[key].tolist() for key in ("index", "code", "layer", *langs)))
+    return {"layer": layer, "languages": list(langs), "count": len(columns["index"]),
+            "terms": [{"index": idx, "code": code, "layer": lay, "glosses": dict(zip(langs, glosses))}
+                      for idx, code, lay, *glosses in rows]}
+
+
+def search_english(query):
+    index = search_index()
+    if not len(index):
+        return {"query": query, "error": "No English translations found in the dictionary"}
+
+    matches = [{"code": code, "index": int(idx) if idx is not None else None, "english": gloss}
+               for code, idx, gloss, _ in index.search(query)]
+    return {"query": query, "matches": matches}
+
+
+def search_english_many(queries):
+    return [search_english(query) for query in queries]
+
+
+def parse_semsearch_args(args):
+    """
+    Split `semsearch` arguments into options and query text: leading
+    "k=N" and "mode=semantic|hybrid" tokens, the rest is the query.
+    :return: (k, hybrid, query)
+    """
+    k, hybrid = 10, False
+    args = list(args)
+    while args and args[0].partition("=")[0] in ("k", "mode") and "=" in args[0]:
+        key, _, value = args.pop(0).partition("=")
+        if key == "k":
+            if not value.isdigit() or not int(value):
+                raise ValueError(f"k must be a positive number, got {value}")
+            k = int(value)
+        elif value in ("semantic", "hybrid"):
+            hybrid = value == "hybrid"
+        else:
+            raise ValueError(f"mode must be semantic or hybrid, got {value}")
+    return k, hybrid, " ".join(args)
+
+
+def parse_auto_args(args):
+    """
+    Split `auto` arguments into a leading "k=N" option (the number of
+    candidate primitives) and the concept.
+    :return: (k, concept)
+    """
+    k, args = AUTO_K, list(args)
+    if args and args[0].startswith("k="):
+        value = args.pop(0)[2:]
+        if not value.isdigit() or not int(value):
+            raise ValueError(f"k must be a positive number, got {value}")
+        k = int(value)
+    return k, " ".join(args)
+
+
+def semantic_search_many(queries, k=10, hybrid=False):
+    """
+    Rank terms by embedding similarity to each query (one embed request and
+    one matrix product for all of them); hybrid mode also weighs gloss
+    matches.
+    """
+    try:
+        from ieml_auto import semantic_search_many as rank
+        ranked = rank(queries, k, lexical=search_index() if hybrid else None)
+    except Exception as e:
+        return [{"query": query, "error": f"Semantic search failed: {e}"} for query in queries]
+
+    results = []
+    for query, hits in zip(queries, ranked):
+        matches = []
+        for code, score, cosine, lexical in hits:
+            match = {"code": code, "index": term_table.index_of(code), "english": term_table.gloss(code),
+                     "score": round(score, 4), "cosine": round(cosine, 4)}
+            if hybrid:
+                match["lexical"] = lexical
+            matches.append(match)
+        results.append({"query": query, "mode": "hybrid" if hybrid else "semantic", "matches": matches})
+    return results
+
+
+def semantic_search(query, k=10, hybrid=False):
+    return semantic_search_many([query], k, hybrid)[0]
+
+
+def run_command(line):
+    """
+    Run one REPL command line and return (command, args, result dict).
+    Unknown commands yield an UNKNOWN_COMMAND error result. `auto` answers
+    one concept at a time here, see ieml_pipeline for many.
+    """
+    parts = normalize_code(line).split()
+    if not parts:
+        return None, [], {"error": "Empty command"}
+    cmd, args = parts[0].lower(), parts[1:]
+
+    if cmd == "parse" and len(args) == 1:
+        return cmd, args, term_details(args[0])
+    elif cmd == "index" and len(args) == 1:
+        return cmd, args, term_by_index(args[0])
+    elif cmd in ("neighbours", "neighbors") and args:
+        try:
+            options = parse_neighbour_options(args[1:])
+        except ValueError as e:
+            return "neighbors", args, {"term": args[0], "error": str(e)}
+        return "neighbors", args, term_neighbors(args[0], options.get("page", 1), options.get("type"))
+    elif cmd == "relation" and len(args) == 2:
+        return cmd, args, term_relation(args[0], args[1])
+    elif cmd == "hops" and len(args) in (1, 2):
+        return cmd, args, term_hops(*args)
+    elif cmd == "distances" and len(args) >= 2:
+        return cmd, args, term_distances(args)
+    elif cmd == "dump":
+        try:
+            options = parse_dump_options(args)
+        except ValueError as e:
+            return cmd, args, {"error": str(e)}
+        return cmd, args, dump_terms(options.get("layer"), options.get("lang", ["en"]))
+    elif cmd == "search" and args:
+        return cmd, args, search_english(" ".join(args))
+    elif cmd == "semsearch" and args:
+        try:
+            k, hybrid, query = parse_semsearch_args(args)
+        except ValueError as e:
+            return cmd, args, {"error": str(e)}
+        if not query:
+            return cmd, args, {"error": UNKNOWN_COMMAND}
+        return cmd, args, semantic_search(query, k, hybrid)
+    elif cmd == "auto" and args:
+        try:
+            k, concept = parse_auto_args(args)
+        except ValueError as e:
+            return cmd, args, {"error": str(e)}
+        if not concept:
+            return cmd, args, {"error": UNKNOWN_COMMAND}
+        from ieml_auto import auto_concept
+        return cmd, args, auto_concept(concept, k)
+    return cmd, args, {"error": UNKNOWN_COMMAND}
@@ -0,0 +1,72 @@
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from ieml.dictionary.version import phonetic
+
+from ieml_terms import code_key
+
+_N = 3
+
+
+def _grams(key):
+    # pad so that short scripts and script boundaries still produce grams
+    padded = f"^{key}$"
+    return {padded[i:i + _N] for i in range(max(1, len(padded) - _N + 1))}
+
+
+class FuzzyIndex:
+    """
+    "Did you mean?" index over IEML scripts.
+
+    Scripts are keyed by the phonetic form of their code key (brackets and
+    layer marks removed, see `code_key` and `phonetic`) and indexed by trigram. A query only scores the few scripts
+    sharing the most trigrams with it, instead of running SequenceMatcher
+    over the whole dictionary.
+    """
+    def __init__(self, codes, shortlist=64):
+        self.codes = list(codes)
+        self.keys = [phonetic(code_key(c)) for c in self.codes]
+        self.shortlist = shortlist
+
+        postings = {}
+        for i, key in enumerate(self.keys):
+            for g in _grams(key):
+                postings.setdefault(g, []).append(i)
+        self.postings = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+
+    @classmethod
+    def from_table(cls, table):
+        return cls(table.codes)
+
+    def suggest(self, code, n=5, cutoff=0.6):
+        """
+        Close matches for `code`, best first, with the same scoring and cutoff
+        as difflib.get_close_matches.
+        """
+        code = code_key(code)
+        key = phonetic(code)
+        hits = [self.postings[g] for g in _grams(key) if g in self.postings]
+        if not hits:
+            return []
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.codes))
+        k = min(self.shortlist, np.count_nonzero(counts))
+        shortlist = np.argpartition(-counts, k - 1)[:k]
+
+        scored = []
+        matcher = SequenceMatcher()
+        matcher.set_seq2(code)
+        for i in shortlist:
+            candidate = self.codes[i]
+            matcher.set_seq1(code_key(candidate))
+            if self.keys[i] == key:
+                # same script up to layer marks: ahead of any other match
+                score = 1.0 + matcher.ratio()
+            elif matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            else:
+                score = matcher.ratio()
+            if score >= cutoff:
+                scored.append((-score, candidate))
+        scored.sort()
+        return [candidate for _, candidate in scored[:n]]
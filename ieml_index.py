@@ -0,0 +1,176 @@
+import os
+import numpy as np
+
+from ieml_retrieval import normalize_rows
+
+
+def index_path(embeddings_path: str) -> str:
+    # gloss_embeddings.npz / gloss_embeddings.npy -> gloss_embeddings.index.npz
+    root, _ = os.path.splitext(embeddings_path)
+    return f"{root}.index.npz"
+
+
+class FlatIndex:
+    """
+    Exact cosine index: one matrix-vector product over pre-normalized
+    float32 rows (float16 rows are upcast per query).
+    """
+    kind = "flat"
+    exact = True
+
+    def __init__(self, matrix, normalized=False):
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def scan(self, q):
+        # Return (row ids, cosine scores) of every row the index looks at
+        return np.arange(len(self)), self.matrix @ q
+
+    def search(self, q, k):
+        ids, scores = self.scan(normalize_rows(q))
+        return _top_k(ids, scores, k)
+
+    def search_many(self, queries, k):
+        # [(ids, scores)] per query row, from a single matrix product
+        scores = normalize_rows(queries) @ self.matrix.T
+        return list(zip(*_top_k_rows(scores, k)))
+
+    def state(self):
+        return {}
+
+    @classmethod
+    def from_state(cls, matrix, state, normalized=False):
+        return cls(matrix, normalized=normalized)
+
+
+class IVFIndex:
+    """
+    Approximate cosine index: rows are bucketed by spherical k-means and a
+    query only scores the rows of its `nprobe` closest buckets.
+    """
+    kind = "ivf"
+    exact = False
+
+    def __init__(self, matrix, nlist=None, nprobe=8, iterations=10, seed=0,
+                 centroids=None, list_ids=None, list_offsets=None, normalized=False):
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+        self.nprobe = nprobe
+
+        if centroids is None:
+            n = self.matrix.shape[0]
+            nlist = nlist or max(1, int(np.sqrt(n)))
+            centroids, assign = _spherical_kmeans(self.matrix, nlist, iterations, seed)
+            list_ids = np.argsort(assign, kind="stable")
+            list_offsets = np.searchsorted(assign[list_ids], np.arange(len(centroids) + 1))
+
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_ids = np.asarray(list_ids, dtype=np.int64)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def scan(self, q, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        ids = np.concatenate([self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]]
+                              for c in closest])
+        return ids, self.matrix[ids] @ q
+
+    def search(self, q, k, nprobe=None):
+        ids, scores = self.scan(normalize_rows(q), nprobe=nprobe)
+        return _top_k(ids, scores, k)
+
+    def search_many(self, queries, k, nprobe=None):
+        # buckets differ per query, no shared product to batch
+        return [self.search(q, k, nprobe=nprobe) for q in queries]
+
+    def state(self):
+        return {
+            "nprobe": np.int64(self.nprobe),
+            "centroids": self.centroids,
+            "list_ids": self.list_ids,
+            "list_offsets": self.list_offsets,
+        }
+
+    @classmethod
+    def from_state(cls, matrix, state, normalized=False):
+        return cls(matrix, nprobe=int(state["nprobe"]),
+                   centroids=state["centroids"],
+                   list_ids=state["list_ids"],
+                   list_offsets=state["list_offsets"],
+                   normalized=normalized)
+
+
+BACKENDS = {cls.kind: cls for cls in (FlatIndex, IVFIndex)}
+
+
+def build_index(matrix, kind="flat", **params):
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown index backend {kind!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[kind](matrix, **params)
+
+
+def save_index(index, path):
+    np.savez(path, kind=index.kind, n_rows=np.int64(len(index)), **index.state())
+
+
+def load_index(path, matrix, normalized=False):
+    """
+    Load an index saved by `save_index` over the embedding matrix it was built
+    from. The matrix itself is not stored in the index file; pass
+    normalized=True for rows that are already unit length (e.g. a memory-mapped
+    EmbeddingStore) so they are used in place without a copy.
+    """
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        if int(data["n_rows"]) != len(matrix):
+            raise ValueError(f"Index {path} was built for {int(data['n_rows'])} rows, "
+                             f"embeddings have {len(matrix)}")
+        state = {k: data[k] for k in data.files}
+    return BACKENDS[kind].from_state(matrix, state, normalized=normalized)
+
+
+def _top_k(ids, scores, k):
+    k = min(k, len(ids))
+    if k < len(ids):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(ids))
+    part = part[np.argsort(-scores[part], kind="stable")]
+    return ids[part], scores[part]
+
+
+def _top_k_rows(scores, k):
+    # _top_k for every row of a (queries x rows) score matrix
+    n = scores.shape[1]
+    k = min(k, n)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape)
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def _spherical_kmeans(matrix, nlist, iterations, seed):
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    nlist = min(nlist, n)
+    centroids = matrix[rng.choice(n, size=nlist, replace=False)].copy()
+
+    assign = np.zeros(n, dtype=np.int64)
+    for _ in range(iterations):
+        assign = np.argmax(matrix @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, matrix)
+        # re-seed empty buckets on random rows
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = matrix[rng.integers(n, size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+
+    assign = np.argmax(matrix @ centroids.T, axis=1)
+    return centroids, assign
@@ -0,0 +1,102 @@
+"""
+Deferred creation of the heavy REPL subsystems (dictionary, indexes,
+embedding store, LLM client) and the startup timing they feed.
+
+A subsystem is declared with `lazy(name, factory)` and created by the first
+`.get()`, from whichever thread asks first; `warm()` creates them in a
+background thread while the prompt is already waiting for input.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Wall-clock duration of the named startup phases, in the order they
+    finished.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.phases.append((name, seconds, threading.current_thread().name))
+
+    def report(self, out):
+        width = max((len(name) for name, _, _ in self.phases), default=0)
+        for name, seconds, thread in self.phases:
+            where = f"  ({thread})" if thread != "MainThread" else ''
+            print(f"  {name:<{width}}  {seconds * 1000:9.1f} ms{where}", file=out)
+
+
+profile = StartupProfile()
+
+# Declared subsystems by name, in declaration order
+SUBSYSTEMS = {}
+
+
+class Lazy:
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    with profile.phase(self.name):
+                        self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+
+def lazy(name, factory):
+    SUBSYSTEMS[name] = subsystem = Lazy(name, factory)
+    return subsystem
+
+
+def load_all(names=None, quiet=False):
+    # Create the named subsystems (all declared ones by default), logging failures
+    for name in names or list(SUBSYSTEMS):
+        try:
+            SUBSYSTEMS[name].get()
+        except Exception as e:
+            logger.log(logging.DEBUG if quiet else logging.WARNING, "Could not load %s: %s", name, e)
+
+
+def warm(before=None, exclude=()):
+    """
+    Load every declared subsystem but `exclude` in a daemon thread;
+    `before()` runs first in that thread (e.g. to import the modules
+    declaring more subsystems).
+    """
+    def run():
+        if before is not None:
+            before()
+        # a subsystem that fails here fails again, loudly, on the command using it
+        load_all([name for name in SUBSYSTEMS if name not in exclude], quiet=True)
+
+    thread = threading.Thread(target=run, name="warm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,138 @@
+"""
+Neighbour table of a dictionary version, stored in its snapshot:
+
+    neighbours_indptr.npy     CSR row offsets, one row per term
+    neighbours_indices.npy    neighbour term index, sorted within a row
+    neighbours_types.npy      uint32 bit mask of the relation types linking
+                              the term to that neighbour
+
+Bit k of a mask stands for meta.json["relation_types"][k]. Glosses are not
+copied: a neighbour index is also its row in the translations_<lang> columns.
+"""
+import numpy as np
+
+PAGE_SIZE = 50
+
+
+def _typed_relations(dic):
+    # [(relation type, square matrix)]; a dictionary without typed relations
+    # only exposes its connexity
+    graph = dic.relations_graph
+    relations = getattr(graph, "relations", None)
+    if not isinstance(relations, dict) or not relations:
+        return [("connexity", graph.connexity)]
+
+    typed = []
+    for name, matrix in sorted(relations.items()):
+        if name == "identity":
+            # every term with itself, not a neighbour
+            continue
+        if getattr(matrix, "ndim", 2) == 3:
+            # stacked relations (one matrix per level)
+            typed.extend((f"{name}_{k}", m) for k, m in enumerate(matrix))
+        else:
+            typed.append((name, matrix))
+    return typed
+
+
+def _edges(matrix):
+    if hasattr(matrix, "tocoo"):
+        m = matrix.tocoo()
+        keep = m.data != 0
+        return m.row[keep], m.col[keep]
+    return np.nonzero(np.asarray(matrix))
+
+
+def build_neighbours(dic, n):
+    """
+    Neighbour table sections for the `n` terms of a loaded Dictionary.
+    :return: (sections dict, list of relation type names)
+    """
+    typed = _typed_relations(dic)
+    if len(typed) > 32:
+        raise ValueError(f"{len(typed)} relation types do not fit a uint32 mask")
+
+    rows, cols, masks = [], [], []
+    for bit, (_, matrix) in enumerate(typed):
+        r, c = _edges(matrix)
+        rows.append(r.astype(np.int64))
+        cols.append(c.astype(np.int64))
+        masks.append(np.full(len(r), 1 << bit, dtype=np.uint32))
+    rows, cols, masks = np.concatenate(rows), np.concatenate(cols), np.concatenate(masks)
+    # contains, contained and the table relations also link every term to itself
+    keep = rows != cols
+    rows, cols, masks = rows[keep], cols[keep], masks[keep]
+
+    # merge the types of duplicate (term, neighbour) pairs into one mask
+    keys, inverse = np.unique(rows * n + cols, return_inverse=True)
+    merged = np.zeros(len(keys), dtype=np.uint32)
+    np.bitwise_or.at(merged, inverse, masks)
+    rows, cols = keys // n, keys % n
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    sections = {"neighbours_indptr": indptr,
+                "neighbours_indices": cols.astype(np.int32),
+                "neighbours_types": merged}
+    return sections, [name for name, _ in typed]
+
+
+class NeighbourTable:
+    """
+    Read side of the neighbour table of a snapshot.
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.types = snapshot.meta["relation_types"]
+        self.indptr = snapshot.section("neighbours_indptr")
+        self.indices = snapshot.section("neighbours_indices")
+        self.masks = snapshot.section("neighbours_types")
+
+    def type_mask(self, types):
+        """
+        Bit mask of the relation type names in `types`.
+        :raise KeyError: on an unknown type
+        """
+        mask = 0
+        for name in types:
+            if name not in self.types:
+                raise KeyError(name)
+            mask |= 1 << self.types.index(name)
+        return mask
+
+    def type_names(self, mask):
+        return [name for bit, name in enumerate(self.types) if mask >> bit & 1]
+
+    def row(self, idx, mask=None):
+        """
+        Neighbours of term `idx`, restricted to those linked by one of the
+        types in `mask` when given.
+        :return: (neighbour indices, type masks)
+        """
+        lo, hi = self.indptr[idx], self.indptr[idx + 1]
+        indices, masks = self.indices[lo:hi], self.masks[lo:hi]
+        if mask is not None:
+            keep = (masks & mask) != 0
+            indices, masks = indices[keep], masks[keep]
+        return indices, masks
+
+    def page(self, idx, page=1, page_size=PAGE_SIZE, mask=None):
+        """
+        One page (1-based) of the neighbours of `idx`.
+        :return: (neighbour indices, type masks, total number of neighbours)
+        """
+        indices, masks = self.row(idx, mask)
+        start = (page - 1) * page_size
+        return indices[start:start + page_size], masks[start:start + page_size], len(indices)
+
+    def edges(self, mask=None):
+        """
+        The whole neighbour graph as parallel arrays (term, neighbour, type mask).
+        """
+        n = len(self.indptr) - 1
+        sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+        targets, masks = np.asarray(self.indices), np.asarray(self.masks)
+        if mask is not None:
+            keep = (masks & mask) != 0
+            sources, targets, masks = sources[keep], targets[keep], masks[keep]
+        return sources, targets, masks
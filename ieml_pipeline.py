@@ -0,0 +1,81 @@
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from ieml_auto import compose_selection, embed_concepts, top_primitives
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _compose(concept, candidates):
+    try:
+        return compose_selection(concept, candidates)
+    except Exception as e:
+        logger.warning("auto failed for %r: %s", concept, e)
+        return {"concept": concept, "candidates": candidates, "error": str(e)}
+
+
+def _failed(concept, e):
+    # an already finished future holding the error record of `concept`
+    logger.warning("auto failed for %r: %s", concept, e)
+    future = Future()
+    future.set_result({"concept": concept, "error": str(e)})
+    return future
+
+
+def _drain(pending, ordered, block):
+    if ordered:
+        while pending and (block or pending[0].done()):
+            yield pending.popleft().result()
+        return
+
+    while pending:
+        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        if not done:
+            return
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+
+def auto_batch(concepts, k=15, batch_size=32, concurrency=4, ordered=True):
+    """
+    Run `auto` over many concepts. Concepts are embedded `batch_size` at a
+    time in a single embed request and retrieved locally, while generation
+    runs on `concurrency` worker threads, so embedding the next batch overlaps
+    with the model answering the previous one.
+
+    Yields {"concept", "candidates", "response", "selection"} dicts
+    ({"error"} instead of "response" when generation failed), in input order when `ordered`,
+    otherwise as they complete. A failed embedding or retrieval yields
+    {"concept", "error"} for the concepts concerned, the batch goes on.
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for chunk in _chunks(concepts, batch_size):
+            try:
+                vectors = embed_concepts(chunk)
+            except Exception as e:
+                pending.extend(_failed(concept, e) for concept in chunk)
+                yield from _drain(pending, ordered, block=False)
+                continue
+            for concept, vec in zip(chunk, vectors):
+                try:
+                    candidates = top_primitives(concept, k, vec=vec)
+                except Exception as e:
+                    pending.append(_failed(concept, e))
+                    continue
+                pending.append(pool.submit(_compose, concept, candidates))
+            yield from _drain(pending, ordered, block=False)
+        yield from _drain(pending, ordered, block=True)
@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+UNREACHABLE = -1
+
+
+def _gather(indptr, indices, nodes):
+    """
+    Concatenate the CSR rows of `nodes` without a Python loop.
+    :return: (neighbours, position in `nodes` each neighbour came from)
+    """
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=indices.dtype), np.empty(0, dtype=np.int64)
+    owner = np.repeat(np.arange(len(nodes)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[starts[owner] + offsets], owner
+
+
+class RelationGraph:
+    """
+    Distance queries over the connexity matrix kept in CSR form (see
+    ieml_snapshot); the graph is never densified. Breadth-first searches
+    expand a whole frontier per step with array operations, and
+    single-source results are kept in a small LRU cache tied to the graph of
+    the loaded dictionary version.
+    """
+    def __init__(self, indptr, indices, cache_size=256):
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.n = len(self.indptr) - 1
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(*snapshot.relations)
+
+    def bfs(self, source, max_depth=None):
+        """
+        Single-source breadth-first search.
+        :return: (distance array, UNREACHABLE where unreached; parent array)
+        """
+        key = (source, max_depth)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        dist = np.full(self.n, UNREACHABLE, dtype=np.int32)
+        parent = np.full(self.n, UNREACHABLE, dtype=np.int32)
+        dist[source] = 0
+        frontier = np.array([source], dtype=np.int64)
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            depth += 1
+            nbrs, owner = _gather(self.indptr, self.indices, frontier)
+            fresh = dist[nbrs] == UNREACHABLE
+            nbrs, owner = nbrs[fresh], owner[fresh]
+            # keep the first parent found for nodes reached twice in this step
+            nbrs, first = np.unique(nbrs, return_index=True)
+            dist[nbrs] = depth
+            parent[nbrs] = frontier[owner[first]]
+            frontier = nbrs.astype(np.int64)
+
+        with self._cache_lock:
+            self._cache[key] = dist, parent
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return dist, parent
+
+    def distance(self, i, j):
+        # Number of hops from i to j, None when j is unreachable
+        d = int(self.bfs(i)[0][j])
+        return None if d == UNREACHABLE else d
+
+    def path(self, i, j):
+        # [i, ..., j] along a shortest path, None when j is unreachable
+        dist, parent = self.bfs(i)
+        if dist[j] == UNREACHABLE:
+            return None
+        path = [j]
+        while path[-1] != i:
+            path.append(int(parent[path[-1]]))
+        return path[::-1]
+
+    def k_hop(self, i, k):
+        """
+        Terms within `k` hops of `i` (excluding i).
+        :return: list of (term index, distance) sorted by distance
+        """
+        dist = self.bfs(i, max_depth=k)[0]
+        nodes = np.flatnonzero(dist > 0)
+        order = np.argsort(dist[nodes], kind="stable")
+        return [(int(n), int(dist[n])) for n in nodes[order]]
+
+    def pairwise(self, nodes):
+        """
+        All-pairs hop distances between a small set of terms, from one
+        batched BFS that advances every source together.
+        :return: len(nodes) x len(nodes) int array, UNREACHABLE where unreached
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        s = len(nodes)
+        dist = np.full((s, self.n), UNREACHABLE, dtype=np.int32)
+        dist[np.arange(s), nodes] = 0
+
+        # frontier as parallel arrays of (source row, term)
+        src, frontier = np.arange(s), nodes
+        depth = 0
+        while len(frontier) and (dist[:, nodes] == UNREACHABLE).any():
+            depth += 1
+            nbrs, owner = _gather(self.indptr, self.indices, frontier)
+            rows = src[owner]
+            fresh = dist[rows, nbrs] == UNREACHABLE
+            rows, nbrs = rows[fresh], nbrs[fresh]
+            flat = np.unique(rows * self.n + nbrs)
+            src, frontier = flat // self.n, flat % self.n
+            dist[src, frontier] = depth
+
+        return dist[:, nodes]
@@ -0,0 +1,131 @@
+import numpy as np
+
+# Neighbour pages fetched per query; after the last one the page keeps doubling
+PAGE_SIZES = (32, 64, 128)
+
+
+class RetrievalStats:
+    # Per-query counters: embed round trips and embedding rows scored
+    __slots__ = ("embed_calls", "rows_scored")
+
+    def __init__(self):
+        self.embed_calls = 0
+        self.rows_scored = 0
+
+    def __repr__(self):
+        return f"RetrievalStats(embed_calls={self.embed_calls}, rows_scored={self.rows_scored})"
+
+
+def normalize_rows(matrix):
+    # L2-normalize rows so a dot product is a cosine similarity
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def clean_code(c: str) -> str:
+    return c.strip(" ,\"'")
+
+
+def validate_codes(codes):
+    """
+    Clean every code and mark the ones that parse as dictionary terms.
+
+    Only the first occurrence of a cleaned code is marked valid so the mask
+    also deduplicates. Run once at bake or load time, never per query.
+    :return: (list of cleaned codes, boolean numpy array)
+    """
+    from ieml.dictionary import term
+
+    cleaned = [clean_code(str(c)) for c in codes]
+    valid = np.zeros(len(cleaned), dtype=bool)
+    seen = set()
+    for i, code in enumerate(cleaned):
+        if code in seen:
+            continue
+        seen.add(code)
+        try:
+            term(code)
+        except Exception:
+            continue
+        valid[i] = True
+    return cleaned, valid
+
+
+def _pages(n):
+    size = 0
+    for size in PAGE_SIZES:
+        if size >= n:
+            break
+        yield size
+    else:
+        size *= 2
+        while size < n:
+            yield size
+            size *= 2
+    yield n
+
+
+class CandidateRetriever:
+    """
+    Rank gloss embeddings against a concept and yield valid codes lazily.
+
+    Rows come from a vector index (see ieml_index) and are filtered by the
+    validated-code mask, so query time is a pure vector operation with no term
+    parsing. The concept is embedded once; neighbours are then taken from the
+    scanned scores in growing pages with a partial top-k, so a query that is
+    satisfied by the first page never sorts the whole dictionary.
+    """
+    def __init__(self, codes, index, valid, embed):
+        self.codes = list(codes)
+        self.index = index
+        self.valid = np.asarray(valid, dtype=bool)
+        self._embed = embed
+
+    def _ranked(self, ids, scores, stats):
+        stats.rows_scored += len(ids)
+        keep = self.valid[ids]
+        ids, scores = ids[keep], scores[keep]
+
+        n = len(ids)
+        start = 0
+        for page in _pages(n):
+            if page < n:
+                top = np.argpartition(-scores, page - 1)[:page]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            yield from ids[top[start:]]
+            start = page
+
+    def candidates(self, concept, vec=None, stats=None):
+        """
+        Yield valid codes closest to `concept`. `vec` skips the embed call when
+        the concept embedding is already known (e.g. embedded in a batch).
+        Counters go to `stats`, a RetrievalStats owned by the caller, so
+        queries running concurrently on a shared retriever never mix them.
+        """
+        if stats is None:
+            stats = RetrievalStats()
+
+        if vec is None:
+            vec = self._embed(concept)
+            stats.embed_calls += 1
+        q = normalize_rows(np.asarray(vec).reshape(-1))
+
+        ids, scores = self.index.scan(q)
+        if self.index.exact:
+            for i in self._ranked(ids, scores, stats):
+                yield self.codes[i]
+            return
+
+        # approximate index ran dry: rescan every bucket for the remaining rows
+        seen = set()
+        for i in self._ranked(ids, scores, stats):
+            seen.add(i)
+            yield self.codes[i]
+        ids, scores = self.index.scan(q, nprobe=len(self.index.centroids))
+        rest = np.fromiter((i not in seen for i in ids), dtype=bool, count=len(ids))
+        for i in self._ranked(ids[rest], scores[rest], stats):
+            yield self.codes[i]
@@ -0,0 +1,105 @@
+import re
+from collections import defaultdict
+
+# Match quality, best first
+EXACT, TOKEN, PREFIX, SUBSTRING = range(4)
+
+_TOKEN_RE = re.compile(r"\w+")
+_NGRAM = 3
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    """
+    Inverted index over the English glosses.
+
+    Glosses are lowercased once; a token index answers whole-word queries and
+    a 1- to 3-gram index narrows substring queries to the few glosses that
+    contain every trigram of the query before the final `in` check. Term
+    indices are resolved once at build time.
+    """
+    def __init__(self, entries):
+        # entries: iterable of (code, gloss, term index or None)
+        entries = [(code, gloss, idx) for code, gloss, idx in entries if gloss]
+        self.codes = [code for code, _, _ in entries]
+        self.glosses = [gloss for _, gloss, _ in entries]
+        self.indices = [idx for _, _, idx in entries]
+        self.lowered = [gloss.lower() for gloss in self.glosses]
+        self.gloss_tokens = [tuple(tokenize(text)) for text in self.lowered]
+
+        tokens = defaultdict(set)
+        grams = defaultdict(set)
+        for i, text in enumerate(self.lowered):
+            for tok in self.gloss_tokens[i]:
+                tokens[tok].add(i)
+            for n in range(1, _NGRAM + 1):
+                for g in _grams(text, n):
+                    grams[g].add(i)
+
+        self.tokens = {tok: frozenset(ids) for tok, ids in tokens.items()}
+        self.grams = {g: frozenset(ids) for g, ids in grams.items()}
+
+    @classmethod
+    def from_table(cls, table, lang="en"):
+        glosses = table.glosses(lang)
+        if glosses is None:
+            return cls([])
+        glosses = glosses.tolist()
+        return cls((code, gloss, idx) for idx, (code, gloss) in enumerate(zip(table.codes, glosses)))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _candidates(self, q, q_tokens):
+        if len(q) <= _NGRAM:
+            return self.grams.get(q, frozenset())
+
+        postings = [self.grams.get(g) for g in _grams(q, _NGRAM)]
+        # tokens strictly inside the query must appear as whole gloss tokens
+        postings += [self.tokens.get(t) for t in q_tokens[1:-1]]
+        if any(p is None for p in postings):
+            return frozenset()
+        postings.sort(key=len)
+        ids = postings[0]
+        for p in postings[1:]:
+            ids = ids & p
+            if not ids:
+                break
+        return ids
+
+    def _quality(self, i, q, q_tokens):
+        if self.lowered[i] == q:
+            return EXACT
+        if q_tokens and all(i in self.tokens.get(t, ()) for t in q_tokens):
+            return TOKEN
+        if any(t.startswith(q) for t in self.gloss_tokens[i]):
+            return PREFIX
+        return SUBSTRING
+
+    def search(self, query, limit=None):
+        """
+        Return [(code, term index, gloss, match quality)] for every gloss
+        containing `query` (case-insensitive), best matches first.
+        """
+        q = query.lower()
+        if not q:
+            return []
+        q_tokens = tokenize(q)
+        candidates = self._candidates(q, q_tokens)
+        if len(q) > _NGRAM:
+            # trigram postings only guarantee a superset, confirm the substring
+            candidates = [i for i in candidates if q in self.lowered[i]]
+        hits = [(self._quality(i, q, q_tokens), len(self.glosses[i]), self.codes[i], i)
+                for i in candidates]
+        hits.sort()
+        if limit is not None:
+            hits = hits[:limit]
+        return [(self.codes[i], self.indices[i], self.glosses[i], quality)
+                for quality, _, _, i in hits]
@@ -0,0 +1,78 @@
+import numpy as np
+
+from ieml_retrieval import normalize_rows
+from ieml_search import EXACT, PREFIX, SUBSTRING, TOKEN
+from ieml_terms import code_key
+
+# Lexical score of each gloss match quality, for hybrid ranking
+LEXICAL_SCORES = {EXACT: 1.0, TOKEN: 0.7, PREFIX: 0.5, SUBSTRING: 0.3}
+# Share of the lexical score in a hybrid score, the rest is the cosine
+LEXICAL_WEIGHT = 0.3
+# Lexical matches considered per query in hybrid mode
+LEXICAL_POOL = 200
+
+
+class SemanticSearch:
+    """
+    Rank dictionary terms by cosine similarity between a query embedding and
+    the gloss embeddings, through the same vector index as `auto`.
+
+    Hybrid ranking (when a SearchIndex is passed as `lexical`) scores the
+    union of the nearest glosses and the lexical matches as
+    (1 - LEXICAL_WEIGHT) * cosine + LEXICAL_WEIGHT * lexical score, the
+    cosine of lexical-only matches being read directly from their rows.
+    """
+    def __init__(self, codes, index, valid):
+        self.codes = list(codes)
+        self.index = index
+        self.valid = np.asarray(valid, dtype=bool)
+        # code key -> embedding row, so lexical hits map whatever their code form
+        self.row_of = {code_key(code): i for i, code in enumerate(self.codes) if self.valid[i]}
+        # over-fetch by the invalid rows so k valid ones always come back
+        self._invalid = int((~self.valid).sum())
+
+    def _nearest(self, queries, k):
+        results = []
+        for ids, scores in self.index.search_many(queries, k + self._invalid):
+            keep = self.valid[ids]
+            results.append((ids[keep][:k], scores[keep][:k]))
+        return results
+
+    def _hybrid(self, lexical_index, query, q, ids, scores, k):
+        cosine = dict(zip(ids.tolist(), scores.tolist()))
+        lexical = {}
+        for code, _, _, quality in lexical_index.search(query, limit=LEXICAL_POOL):
+            row = self.row_of.get(code_key(code))
+            if row is not None:
+                lexical[row] = LEXICAL_SCORES[quality]
+
+        missing = [row for row in lexical if row not in cosine]
+        if missing:
+            rows = np.asarray(self.index.matrix[missing], dtype=np.float32)
+            cosine.update(zip(missing, (rows @ q).tolist()))
+
+        scored = [((1 - LEXICAL_WEIGHT) * cos + LEXICAL_WEIGHT * lexical.get(row, 0.0), row)
+                  for row, cos in cosine.items()]
+        scored.sort(key=lambda s: -s[0])
+        return [(self.codes[row], score, cosine[row], lexical.get(row)) for score, row in scored[:k]]
+
+    def search_many(self, queries, vectors, k=10, lexical=None):
+        """
+        Rank terms for many queries at once, `vectors` being their embeddings;
+        hybrid ranking when `lexical` (a SearchIndex) is given.
+        :return: per query, [(code, score, cosine, lexical score or None)]
+        best first
+        """
+        if not len(queries):
+            return []
+        q = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        # hybrid ranking re-scores a wider semantic pool
+        nearest = self._nearest(q, k * 4 if lexical is not None else k)
+        if lexical is None:
+            return [[(self.codes[i], s, s, None) for i, s in zip(ids.tolist(), scores.tolist())]
+                    for ids, scores in nearest]
+        return [self._hybrid(lexical, query, q_row, ids, scores, k)
+                for query, q_row, (ids, scores) in zip(queries, q, nearest)]
+
+    def search(self, query, vector, k=10, lexical=None):
+        return self.search_many([query], [vector], k, lexical)[0]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Long-running REPL server: one process keeps the dictionary snapshot, the
+indexes and the embedding index warm and answers the REPL commands of any
+number of clients over local HTTP.
+
+    POST /command   {"line": "parse A:"}  ->  {"command", "args", "result"}
+    GET  /health    {"version", "loaded": [subsystems created so far]}
+
+Requests are served on their own threads; every structure they read is
+either immutable after loading or guarded (see ieml_lazy, ieml_relations).
+Connect with `ieml-repl.py --connect URL`.
+"""
+import argparse
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ieml_lazy
+from ieml_commands import import_auto, run_command
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+
+class CommandHandler(BaseHTTPRequestHandler):
+    server_version = "ieml-repl"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt, *args)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+            return
+        from ieml_api import snapshot
+        self._send_json({"version": snapshot.meta["version"],
+                         "loaded": [name for name, s in ieml_lazy.SUBSYSTEMS.items() if s.loaded]})
+
+    def do_POST(self):
+        if self.path != "/command":
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            # a list or a string body raises TypeError here
+            line = json.loads(self.rfile.read(length) or b"{}")["line"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json({"error": f"bad request: {e}"}, status=400)
+            return
+        if not isinstance(line, str):
+            self._send_json({"error": f"bad request: line must be a string, got {type(line).__name__}"},
+                            status=400)
+            return
+
+        try:
+            cmd, args, result = run_command(line)
+        except Exception as e:
+            logger.exception("command %r failed", line)
+            cmd, args, result = None, [], {"error": f"Internal error: {e}"}
+        self._send_json({"command": cmd, "args": args, "result": result})
+
+
+class CommandServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        super().__init__((host, port), CommandHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--no-warm", action="store_true", help="create subsystems on first use only")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = CommandServer(args.host, args.port)
+    if not args.no_warm:
+        # warm everything, including the full Dictionary, once for all clients
+        ieml_lazy.warm(before=import_auto)
+    logger.info("IEML REPL server listening on %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
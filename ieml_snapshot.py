@@ -0,0 +1,131 @@
+"""
+Columnar, memory-mappable snapshot of a dictionary version.
+
+A snapshot is a directory of .npy sections, one per column, plus a small
+meta.json:
+
+    codes.npy                 bare term scripts ("E:", not "[E:]"),
+                              position == term index
+    layers.npy                int8 layer of each term
+    neighbour_counts.npy      int32 number of neighbours of each term
+    translations_<lang>.npy   gloss of each term ('' when missing)
+    relations_indptr.npy      connexity matrix in CSR form
+    relations_indices.npy
+    neighbours_*.npy          typed neighbour table, see ieml_neighbours
+
+Sections are opened with mmap_mode='r' on first access, so opening a
+snapshot costs a directory listing and every process reading the same
+version shares its pages.
+"""
+import json
+import os
+import shutil
+from functools import cached_property
+
+import numpy as np
+
+from ieml_neighbours import build_neighbours
+
+SNAPSHOT_FORMAT = 5
+
+
+def _csr(matrix):
+    # (indptr, indices) of a dense or scipy sparse square boolean matrix
+    if hasattr(matrix, "tocsr"):
+        m = matrix.tocsr()
+        m.eliminate_zeros()
+        m.sort_indices()
+        return m.indptr.astype(np.int64), m.indices.astype(np.int32)
+    rows, cols = np.nonzero(np.asarray(matrix))
+    indptr = np.zeros(len(matrix) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(matrix)), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+
+def write_snapshot(dic, path):
+    """
+    Write the snapshot of a loaded Dictionary to the directory `path`.
+    """
+    terms = sorted(dic.index, key=lambda t: t.index)
+    if [t.index for t in terms] != list(range(len(terms))):
+        raise ValueError("Dictionary term indices are not contiguous, cannot snapshot")
+
+    # the bare script, as keyed in dic.translations (str(t) is bracketed)
+    codes = [str(t.script) for t in terms]
+    sections = {
+        "codes": np.array(codes, dtype=str),
+        "layers": np.array([t.layer for t in terms], dtype=np.int8),
+    }
+    languages = sorted(dic.translations)
+    for lang in languages:
+        gloss = dic.translations[lang]
+        sections[f"translations_{lang}"] = np.array([gloss.get(c) or '' for c in codes], dtype=str)
+    sections["relations_indptr"], sections["relations_indices"] = _csr(dic.relations_graph.connexity)
+    neighbours, relation_types = build_neighbours(dic, len(codes))
+    sections.update(neighbours)
+    # counted from the table, so that they agree with the neighbours paging
+    sections["neighbour_counts"] = np.diff(neighbours["neighbours_indptr"]).astype(np.int32)
+
+    tmp = f"{path}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for name, array in sections.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), array)
+    with open(os.path.join(tmp, "meta.json"), "w") as fp:
+        json.dump({"format": SNAPSHOT_FORMAT, "version": str(dic.version),
+                   "terms": len(codes), "languages": languages,
+                   "relation_types": relation_types}, fp)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """
+    Read side of a snapshot; every section is loaded lazily on first use.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as fp:
+            self.meta = json.load(fp)
+        if self.meta["format"] != SNAPSHOT_FORMAT:
+            raise ValueError(f"Snapshot {path} has format {self.meta['format']}, expected {SNAPSHOT_FORMAT}")
+        self.version = self.meta["version"]
+        self.languages = self.meta["languages"]
+
+    def __len__(self):
+        return self.meta["terms"]
+
+    def section(self, name):
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    @cached_property
+    def codes(self):
+        return self.section("codes")
+
+    @cached_property
+    def layers(self):
+        return self.section("layers")
+
+    @cached_property
+    def neighbour_counts(self):
+        return self.section("neighbour_counts")
+
+    @cached_property
+    def relations(self):
+        # (indptr, indices) of the connexity matrix
+        return self.section("relations_indptr"), self.section("relations_indices")
+
+    def translations(self, lang):
+        key = f"_translations_{lang}"
+        if key not in self.__dict__:
+            self.__dict__[key] = self.section(f"translations_{lang}")
+        return self.__dict__[key]
+
+    def neighbours(self, idx):
+        indptr, indices = self.relations
+        return indices[indptr[idx]:indptr[idx + 1]]
+
+    def related(self, i, j):
+        row = self.neighbours(i)
+        pos = np.searchsorted(row, j)
+        return bool(pos < len(row) and row[pos] == j)
@@ -0,0 +1,99 @@
+import os
+import numpy as np
+
+from ieml_retrieval import normalize_rows
+
+# gloss_embeddings.npy        L2-normalized float32/float16 matrix, opened memory-mapped
+# gloss_embeddings.codes.npz  code table: codes, clean_codes, valid, gloss_hashes and the
+#                             dictionary version the glosses were taken from
+STORE_PREFIX = "gloss_embeddings"
+
+
+def matrix_path(prefix: str) -> str:
+    return f"{prefix}.npy"
+
+
+def codes_path(prefix: str) -> str:
+    return f"{prefix}.codes.npz"
+
+
+def store_exists(prefix: str = STORE_PREFIX) -> bool:
+    return os.path.isfile(matrix_path(prefix)) and os.path.isfile(codes_path(prefix))
+
+
+class EmbeddingStore:
+    """
+    Read-only gloss embeddings. The matrix is memory-mapped, so every process
+    opening the same store shares the page cache instead of holding its own
+    copy, and opening it costs no parsing or conversion.
+    """
+    def __init__(self, prefix: str = STORE_PREFIX):
+        self.prefix = prefix
+        self.matrix = np.load(matrix_path(prefix), mmap_mode="r")
+        with np.load(codes_path(prefix)) as table:
+            self.codes = table["codes"].tolist()
+            self.clean_codes = table["clean_codes"].tolist()
+            self.valid = table["valid"]
+            # absent from stores migrated from a legacy npz
+            self.gloss_hashes = table["gloss_hashes"].tolist() if "gloss_hashes" in table.files else None
+            self.version = str(table["version"]) if "version" in table.files else None
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dtype(self):
+        return self.matrix.dtype
+
+
+def save_store(prefix, codes, embeddings, clean_codes, valid, dtype=np.float32,
+               gloss_hashes=None, version=None):
+    """
+    Write embeddings in the memory-mappable store format. Rows are
+    L2-normalized before being cast to `dtype` (float32 or float16).
+    `gloss_hashes` and `version` record what was embedded so a later bake can
+    be incremental.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float16):
+        raise ValueError(f"Unsupported store dtype {dtype}, expected float32 or float16")
+
+    matrix = normalize_rows(embeddings).astype(dtype, copy=False)
+    if len(matrix) != len(codes):
+        raise ValueError(f"{len(codes)} codes for {len(matrix)} embedding rows")
+
+    # write to a temporary name first so readers never map a partial file
+    tmp = f"{prefix}.tmp"
+    np.save(matrix_path(tmp), matrix)
+    extra = {}
+    if gloss_hashes is not None:
+        extra["gloss_hashes"] = np.array(gloss_hashes, dtype=str)
+    if version is not None:
+        extra["version"] = np.array(str(version))
+    np.savez(codes_path(tmp),
+             codes=np.array(codes, dtype=str),
+             clean_codes=np.array(clean_codes, dtype=str),
+             valid=np.asarray(valid, dtype=bool),
+             **extra)
+    os.replace(matrix_path(tmp), matrix_path(prefix))
+    os.replace(codes_path(tmp), codes_path(prefix))
+
+
+def migrate_npz(npz_path, prefix=None, dtype=np.float32):
+    """
+    Convert a legacy gloss_embeddings.npz (pickled codes, float64 matrix) to
+    the store format. Codes are validated here if the npz predates the
+    `valid` column.
+    :return: the store prefix
+    """
+    from ieml_retrieval import validate_codes
+
+    prefix = prefix or os.path.splitext(npz_path)[0]
+    with np.load(npz_path, allow_pickle=True) as data:
+        codes = data["codes"].tolist()
+        if "valid" in data.files:
+            clean_codes, valid = data["clean_codes"].tolist(), data["valid"]
+        else:
+            clean_codes, valid = validate_codes(codes)
+        save_store(prefix, codes, data["embeddings"], clean_codes, valid, dtype=dtype)
+    return prefix
@@ -0,0 +1,151 @@
+import sys
+import unicodedata
+
+import numpy as np
+
+# Error of command lines run_command does not understand
+UNKNOWN_COMMAND = "Unknown command"
+
+
+def normalize_code(code_str):
+    # Normalize term codes. Apply Unicode NFKC, convert curly quotes and dashes.
+    s = unicodedata.normalize('NFKC', code_str)
+    s = s.replace('’', "'").replace('‘', "'")
+    s = s.replace('–', '-').replace('—', '-')
+    return s
+
+
+def code_key(code_str):
+    """
+    Lookup key of a term code: "[E:]", " E: " and "E:" all give "E:".
+    Strips the brackets str(Term) adds and surrounding whitespace, then normalizes.
+    """
+    s = code_str.strip()
+    if s.startswith('[') and s.endswith(']'):
+        s = s[1:-1].strip()
+    return normalize_code(s)
+
+
+class TermRecord:
+    """
+    One term of a TermTable.
+    """
+    __slots__ = ("code", "index", "layer", "glosses", "neighbours")
+
+    def __init__(self, code, index, layer, glosses, neighbours):
+        self.code = code
+        self.index = index
+        self.layer = layer
+        # language -> gloss ('' when missing)
+        self.glosses = glosses
+        self.neighbours = neighbours
+
+    def details(self):
+        details = {"term": self.code, "index": self.index, "layer": self.layer}
+        if self.glosses.get("en"):
+            details["english"] = self.glosses["en"]
+        details["neighbours"] = self.neighbours
+        return details
+
+
+class TermTable:
+    """
+    Columnar term metadata over a dictionary snapshot: code, layer, gloss
+    per language and neighbour count, one array each indexed by term index,
+    and a hash index on the normalized code. Built once when the dictionary
+    loads and shared by every command; bulk queries select whole columns.
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.languages = snapshot.languages
+        # interned, so the structures built from the table share the strings
+        self.codes = [sys.intern(code) for code in snapshot.codes.tolist()]
+        self.layers = snapshot.layers
+        self.neighbour_counts = snapshot.neighbour_counts
+        # normalized bare script -> term index
+        self.position = {code_key(code): idx for idx, code in enumerate(self.codes)}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, idx):
+        # Script of the term at `idx`, None when no term has this index
+        if 0 <= idx < len(self.codes):
+            return self.codes[idx]
+        return None
+
+    def __contains__(self, code):
+        return self.index_of(code) is not None
+
+    def index_of(self, code):
+        return self.position.get(code_key(code))
+
+    def glosses(self, lang="en"):
+        # Gloss column of `lang`, None when the dictionary has no such language
+        return self.snapshot.translations(lang) if lang in self.languages else None
+
+    def select(self, indices):
+        # [(index, script or None)] for many indices at once
+        return [(idx, self[idx]) for idx in indices]
+
+    def gloss(self, code, lang="en"):
+        idx = self.index_of(code)
+        column = self.glosses(lang)
+        if idx is None or column is None:
+            return ''
+        return str(column[idx])
+
+    def record(self, idx):
+        return TermRecord(self.codes[idx], idx, int(self.layers[idx]),
+                          {lang: str(self.glosses(lang)[idx]) for lang in self.languages},
+                          int(self.neighbour_counts[idx]))
+
+    def details(self, idx):
+        return self.record(idx).details()
+
+    def where(self, layer=None):
+        # Indices of the terms of `layer` (of every term by default), in order
+        if layer is None:
+            return np.arange(len(self.codes))
+        return np.flatnonzero(self.layers == layer)
+
+    def columns(self, indices, langs=("en",)):
+        """
+        Code, layer and glosses of many terms at once.
+        :return: {"index", "code", "layer", <lang>..: numpy array}
+        :raise KeyError: on a language the dictionary does not have
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = {"index": indices, "code": self.snapshot.codes[indices], "layer": self.layers[indices]}
+        for lang in langs:
+            if lang not in self.languages:
+                raise KeyError(lang)
+            columns[lang] = self.glosses(lang)[indices]
+        return columns
+
+
+def parse_index_spec(spec, limit=None):
+    """
+    Parse `index` arguments: "12", "10-50" (inclusive) or "1,5,10-12".
+    :param limit: number of terms; ranges are clamped to it
+    :return: list of int
+    :raise ValueError: on a malformed spec or a range starting past the end
+    """
+    indices = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part.replace('-', '', 1).isdigit():
+            raise ValueError(f"not an index or range: {part!r}")
+        if '-' in part:
+            start, stop = part.split('-', 1)
+            start, stop = int(start), int(stop)
+            if stop < start:
+                raise ValueError(f"empty range {part}")
+            if limit is not None:
+                if start >= limit:
+                    raise ValueError(f"range {part} starts past the last index {limit - 1}")
+                stop = min(stop, limit - 1)
+            indices.extend(range(start, stop + 1))
+        else:
+            indices.append(int(part))
+    return indices
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Convert a legacy gloss_embeddings.npz into the memory-mapped store format
+(gloss_embeddings.npy + gloss_embeddings.codes.npz).
+"""
+import argparse
+import numpy as np
+
+from ieml_store import migrate_npz, matrix_path, codes_path
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("npz", nargs="?", default="gloss_embeddings.npz")
+    ap.add_argument("--prefix", help="store prefix, defaults to the npz name without extension")
+    ap.add_argument("--float16", action="store_true", help="store the matrix as float16")
+    args = ap.parse_args()
+
+    prefix = migrate_npz(args.npz, args.prefix,
+                         dtype=np.float16 if args.float16 else np.float32)
+    print(f"Migrated {args.npz} to {matrix_path(prefix)} and {codes_path(prefix)}")
+
+
+if __name__ == "__main__":
+    main()
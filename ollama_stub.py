@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama HTTP API (/api/embed and /api/generate).
+
+Embeddings are deterministic pseudo-random unit vectors derived from the
+input text, so runs are reproducible without a model. Point a client at it
+with `Client(host="http://127.0.0.1:<port>")`.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+DIM = 768
+
+
+def fake_embedding(text, dim=DIM):
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).normal(size=dim)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def fake_response(prompt):
+    # echo the first primitive offered in the prompt back as the selection
+    start = prompt.find('"code": "')
+    if start < 0:
+        return "[]"
+    start += len('"code": "')
+    code = prompt[start:prompt.index('"', start)]
+    return json.dumps([{"code": code, "gloss": ""}], indent=2)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "ollama-stub"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        req = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server
+
+        with stub.lock:
+            stub.calls[self.path] = stub.calls.get(self.path, 0) + 1
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if self.path == "/api/embed":
+            inputs = req.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._send_json({"model": req.get("model"),
+                             "embeddings": [fake_embedding(t, stub.dim) for t in inputs]})
+        elif self.path == "/api/generate":
+            text = fake_response(req.get("prompt", ""))
+            if not req.get("stream", True):
+                self._send_json({"model": req.get("model"), "response": text, "done": True})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for i in range(0, len(text), 8):
+                chunk = {"model": req.get("model"), "response": text[i:i + 8], "done": False}
+                self.wfile.write(json.dumps(chunk).encode("utf8") + b"\n")
+                self.wfile.flush()
+                if stub.token_latency:
+                    time.sleep(stub.token_latency)
+            self.wfile.write(json.dumps({"model": req.get("model"), "response": "", "done": True}).encode("utf8") + b"\n")
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+
+class OllamaStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, token_latency=0.0, dim=DIM):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.dim = dim
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    ap.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed chunks")
+    ap.add_argument("--dim", type=int, default=DIM)
+    args = ap.parse_args()
+
+    stub = OllamaStub(args.port, args.latency, args.token_latency, args.dim)
+    print(f"Ollama stub listening on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
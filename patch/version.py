@@ -1,18 +1,24 @@
-import copy
+import hashlib
 import logging
 import pickle
-from functools import lru_cache
-from urllib.request import urlretrieve
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import urlopen
 import datetime
 import urllib.parse
 import json
 import os
 import re
+import xml.etree.ElementTree as ET
 
 from collections import defaultdict
 
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, identity
+
 from ieml.constants import LAYER_MARKS
-from ieml.dictionary.relations import RelationsGraph
+from ieml.dictionary.relations import RelationsGraph, RELATIONS
 from .. import get_configuration, ieml_folder
 from ..constants import LANGUAGES
 
@@ -23,14 +29,226 @@ if not os.path.isdir(VERSIONS_FOLDER):
     os.mkdir(VERSIONS_FOLDER)
 
 
-def get_available_dictionary_version():
-    version_url = get_configuration().get('VERSIONS', 'versionsurl')
-    from ieml.tools import list_bucket
-    return [v[:-5] for v in list_bucket(version_url)]
+
+def _option(name, default=None):
+    return get_configuration().get('VERSIONS', name, fallback=default)
+
+
+# A local mirror of the versions bucket: a directory, or the URL of a local
+# HTTP stand-in serving the same files. Any versions folder filled by
+# prefetch_versions.py can serve as one.
+MIRROR = os.environ.get('IEML_VERSIONS_MIRROR') or _option('mirror')
+
+# Loading a version only reads the versions folder and the mirror; the bucket
+# is contacted by prefetch_versions.py (network=True), unless offline
+OFFLINE = (os.environ.get('IEML_OFFLINE') or _option('offline', 'no')).lower() in ('1', 'yes', 'true', 'on')
+
+# Transfers are retried with an exponential backoff from RETRY_DELAY seconds
+RETRIES = 3
+RETRY_DELAY = 0.5
+TIMEOUT = 30
+
+# Cached version listing, newest first: {"versions": [{"name", "md5"?, "sha256"?}]}
+LISTING_FILE = 'versions.json'
+_listing_lock = threading.Lock()
+
+_S3 = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+def _is_url(location):
+    return urllib.parse.urlparse(location).scheme in ('http', 'https', 'file')
+
+
+def _local_name(name):
+    # Windows compatibility (colon not supported in filename)
+    return (name.replace(':', '-') if os.name == 'nt' else name) + '.json'
+
+
+def _retrying(read, what):
+    """
+    read(), retried on transfer errors and hash mismatches (ValueError);
+    missing files and client errors are raised at once.
+    """
+    for attempt in range(RETRIES):
+        try:
+            return read()
+        except (OSError, ValueError) as e:
+            permanent = isinstance(e, FileNotFoundError) or isinstance(e, HTTPError) and e.code < 500
+            if permanent or attempt + 1 == RETRIES:
+                raise
+            logger.warning("Retrying %s (%s)", what, e)
+            time.sleep(RETRY_DELAY * 2 ** attempt)
+
+
+def _read_url(url):
+    with urlopen(url, timeout=TIMEOUT) as resp:
+        return resp.read()
+
+
+def _read_location(location, name):
+    # file `name` of a directory or URL
+    if _is_url(location):
+        return _read_url(urllib.parse.urljoin(location.rstrip('/') + '/', urllib.parse.quote(name)))
+    with open(os.path.join(location, name), 'rb') as fp:
+        return fp.read()
+
+
+def _bucket_listing(url):
+    # S3 listing, newest first; the ETag of a single part upload is its md5
+    root = ET.fromstring(_retrying(lambda: _read_url(url), url))
+    entries = [{k.tag[len(_S3):]: k.text for k in t} for t in root if t.tag == _S3 + 'Contents']
+    entries.sort(key=lambda e: e['LastModified'], reverse=True)
+
+    listing = []
+    for e in entries:
+        if not e['Key'].endswith('.json'):
+            continue
+        entry = {'name': e['Key'][:-5]}
+        etag = (e.get('ETag') or '').strip('"')
+        if re.fullmatch('[0-9a-f]{32}', etag):
+            entry['md5'] = etag
+        listing.append(entry)
+    return listing
+
+
+def _folder_listing(folder):
+    # the version files of a directory, newest first
+    pattern = re.compile(r"^(dictionary_\d{4}-\d{2}-\d{2}_\d{2}[:-]\d{2}[:-]\d{2})\.json$")
+    names = (pattern.match(f) for f in os.listdir(folder)) if os.path.isdir(folder) else ()
+    return [{'name': str(DictionaryVersion(m.group(1)))} for m in sorted(filter(None, names), key=lambda m: m.group(1), reverse=True)]
+
+
+def _mirror_listing():
+    try:
+        data = _retrying(lambda: _read_location(MIRROR, LISTING_FILE), MIRROR)
+    except FileNotFoundError:
+        return _folder_listing(MIRROR)
+    except HTTPError as e:
+        if e.code != 404:
+            raise
+        # no manifest: a plain S3 stand-in
+        return _bucket_listing(MIRROR)
+    return json.loads(data)['versions']
+
+
+def _read_listing():
+    try:
+        with open(os.path.join(VERSIONS_FOLDER, LISTING_FILE)) as fp:
+            return json.load(fp)['versions']
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable version listing (%s)", e)
+        return None
+
+
+def _write_listing(listing):
+    path = os.path.join(VERSIONS_FOLDER, LISTING_FILE)
+    with open(path + '.tmp', 'w') as fp:
+        json.dump({'versions': listing}, fp, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def refresh_version_listing(network=False):
+    """
+    List the versions of the mirror, or of the bucket with `network` unless
+    offline (of the versions folder otherwise), keeping the hashes already
+    known for them, and cache the listing in the versions folder.
+    :return: the listing, newest first
+    """
+    if MIRROR:
+        listing = _mirror_listing()
+    elif network and not OFFLINE:
+        listing = _bucket_listing(get_configuration().get('VERSIONS', 'versionsurl'))
+    else:
+        # nothing to cache, the folder is the listing
+        return _folder_listing(VERSIONS_FOLDER)
+
+    with _listing_lock:
+        known = {e['name']: e for e in _read_listing() or ()}
+        listing = [{**known.get(e['name'], {}), **e} for e in listing]
+        _write_listing(listing)
+    return listing
+
+
+def get_available_dictionary_version(refresh=False, network=False):
+    """
+    Names of the available versions, newest first, from the listing cached in
+    the versions folder. The listing is only fetched when there is none yet
+    or on `refresh`, from the bucket only with `network` (see
+    prefetch_versions.py).
+    """
+    listing = None if refresh else _read_listing()
+    if listing is None:
+        listing = refresh_version_listing(network)
+    return [e['name'] for e in listing]
+
+
+def _verify(name, data, entry):
+    for algorithm in ('sha256', 'md5'):
+        if algorithm in entry and hashlib.new(algorithm, data).hexdigest() != entry[algorithm]:
+            raise ValueError("%s does not match its %s" % (name, algorithm))
+
+
+def fetch_version_file(name, network=False):
+    """
+    Path of the file of version `name` in the versions folder. A missing file
+    is copied from the mirror, or downloaded from the bucket with `network`
+    unless offline, checked against the hash of the listing, and its sha256
+    recorded there. Loading a version never passes `network`: a request
+    does not wait on the bucket, prefetch_versions.py fills the folder.
+    :raise OSError: when the version can not be fetched
+    """
+    path = os.path.join(VERSIONS_FOLDER, _local_name(name))
+    if os.path.isfile(path):
+        return path
+
+    with _listing_lock:
+        entry = next((e for e in _read_listing() or () if e['name'] == name), {})
+
+    sources = [MIRROR] if MIRROR else []
+    if network and not OFFLINE:
+        sources.append(get_configuration().get('VERSIONS', 'versionsurl'))
+    if not sources:
+        raise OSError("Dictionary version %s is not in %s and no mirror is configured, "
+                      "run prefetch_versions.py" % (name, VERSIONS_FOLDER))
+
+    errors = []
+    for source in sources:
+        def read():
+            data = _read_location(source, name + '.json' if _is_url(source) else _local_name(name))
+            _verify(name, data, entry)
+            return data
+
+        logger.info("Fetching dictionary %s from %s", name, source)
+        try:
+            data = _retrying(read, name)
+            break
+        except (OSError, ValueError) as e:
+            errors.append("%s: %s" % (source, e))
+    else:
+        raise OSError("Could not fetch dictionary version %s (%s)" % (name, '; '.join(errors)))
+
+    with open(path + '.tmp', 'wb') as fp:
+        fp.write(data)
+    os.replace(path + '.tmp', path)
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    with _listing_lock:
+        listing = _read_listing() or []
+        listing = [{**e, 'sha256': sha256} if e['name'] == name else e for e in listing]
+        if not any(e['name'] == name for e in listing):
+            listing.append({'name': name, 'sha256': sha256})
+        _write_listing(listing)
+    return path
 
 
 def latest_dictionary_version():
-    return DictionaryVersion(get_available_dictionary_version()[0])
+    available = get_available_dictionary_version()
+    if not available:
+        raise OSError("No dictionary version in %s and no mirror is configured, "
+                      "run prefetch_versions.py" % VERSIONS_FOLDER)
+    return DictionaryVersion(available[0])
 
 
 def _date_to_str(date):
@@ -44,6 +262,32 @@ def _str_to_date(string):
 def version_name(date):
     return "dictionary_{0}".format(_date_to_str(date))
 
+def _version_file(kind, *versions, ext='pk1'):
+    # <kind>_<version>[_<version>..].<ext> in the versions folder
+    names = [str(v) for v in versions]
+    if os.name == 'nt':
+        names = [n.replace(':', '-') for n in names]
+    return os.path.join(VERSIONS_FOLDER, "{}_{}.{}".format(kind, '_'.join(names), ext))
+
+
+def _load_pickle(path):
+    try:
+        with open(path, 'rb') as fp:
+            return pickle.load(fp)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable %s (%s)", path, e)
+        return None
+
+
+def _dump_pickle(obj, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fp:
+        pickle.dump(obj, fp, protocol=4)
+    os.replace(tmp, path)
+
+
 def phonetic(string):
     for r in LAYER_MARKS:
         string = string.replace(r, '')
@@ -121,6 +365,14 @@ class DictionaryVersion(metaclass=DictionaryVersionSingleton):
 
         self.loaded = False
 
+        # The Changeset over a base version this version was created from, if
+        # any: load() then materializes the version from its base
+        self.changeset = None
+
+        # Derived from diff and history, see composed_diff and get_phonetic_mapping
+        self._composed_diffs = {}
+        self._phonetic_mapping = None
+
     def __str__(self):
         return version_name(self.date)
 
@@ -146,6 +398,8 @@ class DictionaryVersion(metaclass=DictionaryVersionSingleton):
 
         self.history = state['history'] if 'history' in state and state['history'] is not None else {str(self): {t: '+' for t in self.terms}}
 
+        self._composed_diffs = {}
+        self._phonetic_mapping = None
         self.loaded = True
 
     def json(self):
@@ -153,34 +407,23 @@ class DictionaryVersion(metaclass=DictionaryVersionSingleton):
 
     def load(self):
         """
-        Download the dictionary version and cache the retrieved file.
+        Load the dictionary version from the versions folder, copying the
+        version file from the mirror first if it is missing (see
+        fetch_version_file, the bucket is left to prefetch_versions.py).
         :return: None
         """
         if self.loaded:
             return
         
-        version_str = str(self)               
-        remote_name = f"{version_str}.json"   # the S3 object as stored
-        # Windows compatibility (colon not supported in filename)
-        if os.name == 'nt':
-            local_version_str = version_str.replace(':', '-')
-        else:
-            local_version_str = version_str
-        local_name = f"{local_version_str}.json"
-        local_path = os.path.join(VERSIONS_FOLDER, local_name)
-
-        if not os.path.isfile(local_path):
-            bucket = get_configuration().get('VERSIONS', 'versionsurl')
-            remote_url = urllib.parse.urljoin(bucket, remote_name)
-            logger.info("Downloading dictionary %s at %s", remote_name, remote_url)
-
-            # write to memory since file can't be saved on Windows
-            from urllib.request import urlopen
-            resp = urlopen(remote_url)
-            data = resp.read()
-            with open(local_path, 'wb') as fp:
-                fp.write(data)
+        local_path = os.path.join(VERSIONS_FOLDER, _local_name(str(self)))
 
+        if self.changeset is None and not os.path.isfile(local_path):
+            self.changeset = Changeset.read(self)
+        if self.changeset is not None:
+            self.__setstate__(self.changeset.materialize(self))
+            return
+
+        local_path = fetch_version_file(str(self))
         with open(local_path, 'r') as fp:
             self.__setstate__(json.load(fp))
 
@@ -214,45 +457,105 @@ class DictionaryVersion(metaclass=DictionaryVersionSingleton):
     def is_cached(self):
         return os.path.isfile(self.cache)
 
-    @lru_cache(5)
-    def diff_for_version(self, older_version):
-        older_version.load()
-        self.load()
+    def composed_diff(self, older_version=None):
+        """
+        Every rename from `older_version` (the first version with a diff by
+        default) up to this version, composed into a single map
+        old script -> script in this version. Unchanged scripts are left out.
 
-        result = {
-            sc: sc for sc in older_version.terms
-        }
+        The diffs are composed once, in chronological order, at a cost
+        proportional to their size; the result is kept in memory and
+        persisted per version pair in the versions folder.
+        """
+        self.load()
+        if older_version is None:
+            if not self.diff:
+                return {}
+            older_version = min(DictionaryVersion(v) for v in self.diff)
+        older_version = DictionaryVersion(older_version)
+
+        key = str(older_version)
+        if key in self._composed_diffs:
+            return self._composed_diffs[key]
+
+        path = _version_file('diff', older_version, self)
+        composed = _load_pickle(path)
+        if composed is None:
+            composed = {}
+            for v in sorted(filter(lambda v: v >= older_version, (DictionaryVersion(v) for v in self.diff))):
+                # a removal (None) leaves the script as it was
+                diff = {old: new for old, new in self.diff[str(v)].items() if new}
+                # follow the scripts renamed so far, then pick up the scripts renamed for the first time
+                composed = {old: diff.get(cur, cur) for old, cur in composed.items()}
+                composed.update((old, new) for old, new in diff.items() if old not in composed)
+            composed = {old: new for old, new in composed.items() if old != new}
+            _dump_pickle(composed, path)
+
+        self._composed_diffs[key] = composed
+        return composed
 
-        chronology = sorted(filter(lambda v: v >= older_version, (DictionaryVersion(v) for v in self.diff)))
+    def diff_for_version(self, older_version):
+        """
+        :return: a map script in `older_version` -> script in this version,
+        for every script of `older_version`
+        """
+        older_version.load()
+        composed = self.composed_diff(older_version)
+        return {sc: composed.get(sc, sc) for sc in older_version.terms}
 
-        for v in chronology:
-            diff = self.diff[str(v)]
-            for sc_old, sc_new in result.items():
-                if sc_new in diff:
-                    if diff[sc_new]:
-                        result[sc_old] = diff[sc_new]
+    def translate_codes(self, codes, older_version=None):
+        """
+        Translate many stored scripts (of `older_version`, or of any earlier
+        version by default) into the scripts of this version, in one
+        vectorized pass: every code is binary searched among the renamed
+        scripts only.
+        :param codes: iterable of str
+        :return: numpy array of str, in the order of `codes`
+        """
+        composed = self.composed_diff(older_version)
+        codes = np.asarray(codes if isinstance(codes, (list, tuple, np.ndarray)) else list(codes), dtype=str)
+        if not composed or not codes.size:
+            return codes
 
-        return result
+        renamed = np.array(sorted(composed), dtype=str)
+        targets = np.array([composed[sc] for sc in renamed.tolist()], dtype=str)
+        pos = np.searchsorted(renamed, codes)
+        pos[pos == len(renamed)] = 0
+        return np.where(renamed[pos] == codes, targets[pos], codes)
 
     def get_phonetic_mapping(self):
-        phonetic_to_terms = defaultdict(list)
-
-        for i, v in enumerate(sorted(self.history)):
-            for t in self.history[v]:
-                phonetic_to_terms[phonetic(t)].append((i, t))
-
-        result = {}
-        for phon, l_t in phonetic_to_terms.items():
-            if len(l_t) > 1:
-                for i, c in enumerate(sorted(l_t, key=lambda c: (c[0], LAYER_MARKS.index(c[1][-1])))):
-                    _key = phon
-                    if i > 0:
-                        _key = _key + "." + str(i)
-
-                    result[_key] = c[1]
-            else:
-                result[phon] = l_t[0][1]
+        """
+        Map of phonetic key (script without its layer marks, suffixed with
+        .1, .2.. when several scripts share it) -> script, over the whole
+        history. Built once per version and persisted in the versions folder.
+        """
+        if self._phonetic_mapping is not None:
+            return self._phonetic_mapping
 
+        self.load()
+        path = _version_file('phonetic', self)
+        result = _load_pickle(path)
+        if result is None:
+            phonetic_to_terms = defaultdict(list)
+
+            for i, v in enumerate(sorted(self.history)):
+                for t in self.history[v]:
+                    phonetic_to_terms[phonetic(t)].append((i, t))
+
+            result = {}
+            for phon, l_t in phonetic_to_terms.items():
+                if len(l_t) > 1:
+                    for i, c in enumerate(sorted(l_t, key=lambda c: (c[0], LAYER_MARKS.index(c[1][-1])))):
+                        _key = phon
+                        if i > 0:
+                            _key = _key + "." + str(i)
+
+                        result[_key] = c[1]
+                else:
+                    result[phon] = l_t[0][1]
+            _dump_pickle(result, path)
+
+        self._phonetic_mapping = result
         return result
 
 def _latest_installed_version():
@@ -292,7 +595,218 @@ def set_default_dictionary_version(version):
     _default_version = version
 
 
-def create_dictionary_version(old_version=None, add=None, update=None, remove=None, diff=None):
+def _overlay(base, overrides):
+    # a new map: `base` with the `overrides` applied, None deleting a key
+    result = dict(base)
+    for key, value in overrides.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = value
+    return result
+
+
+def _set_member(delta, base, key, present):
+    # record `key` as present or absent, dropping the entry when that is
+    # already the case in `base`
+    if present == (key in base):
+        delta.pop(key, None)
+    else:
+        delta[key] = present
+
+
+class Changeset:
+    """
+    The edits turning a base version into a new one. Only the delta is kept:
+    scripts added (True) to or removed (False) from the terms and the roots,
+    inhibitions and translations set (None when deleted), and the diff and
+    history entries of the new version. The base is only ever read, and the
+    new version materializes (see DictionaryVersion.load) as shallow maps
+    sharing every unchanged value with it.
+    """
+    def __init__(self, base, diff=None):
+        self.base = DictionaryVersion(base)
+        self.terms = {}
+        self.roots = {}
+        self.inhibitions = {}
+        self.translations = {l: {} for l in LANGUAGES}
+        self.diff = dict(diff) if diff else {}
+        self.history = {}
+        self._base_sets = None
+
+    def _sets(self):
+        if self._base_sets is None:
+            self.base.load()
+            self._base_sets = set(self.base.terms), set(self.base.roots)
+        return self._base_sets
+
+    def has_term(self, s):
+        return self.terms.get(s, s in self._sets()[0])
+
+    def has_root(self, s):
+        return self.roots.get(s, s in self._sets()[1])
+
+    def inhibition(self, s):
+        if s in self.inhibitions:
+            return self.inhibitions[s]
+        return self.base.inhibitions.get(s)
+
+    def translation(self, l, s):
+        if s in self.translations[l]:
+            return self.translations[l][s]
+        return self.base.translations[l].get(s)
+
+    def _set_term(self, s, present):
+        _set_member(self.terms, self._sets()[0], s, present)
+
+    def _set_root(self, s, present):
+        _set_member(self.roots, self._sets()[1], s, present)
+
+    def remove(self, scripts):
+        for r in scripts:
+            self._set_term(r, False)
+            self._set_root(r, False)
+            if self.inhibition(r) is not None:
+                self.inhibitions[r] = None
+            for l in LANGUAGES:
+                if self.translation(l, r) is not None:
+                    self.translations[l][r] = None
+
+            self.diff[r] = None
+            self.history[r] = '-'
+
+    def add(self, add):
+        for t in add.get('terms', ()):
+            self._set_term(t, True)
+            self.history[t] = '+'
+
+        for t in add.get('roots', ()):
+            self._set_root(t, True)
+            self.history[t] = '+'
+
+        if 'inhibitions' in add:
+            if any(self.inhibition(s) is not None for s in add['inhibitions']):
+                raise ValueError("Error in creating a new dictionary versions, trying to add multiples "
+                                 "inhibitions rules for the same script.")
+
+            self.inhibitions.update(add['inhibitions'])
+
+        if 'translations' in add:
+            defined = {l: [s for s in add['translations'][l] if self.translation(l, s) is not None] for l in LANGUAGES}
+            if any(defined.values()):
+                raise ValueError("Error in creating a new dictionary version, trying to add multiples "
+                                 "translation for the script {%s}. Those script may already exists in the dictionary."%', '.join(['"%s": [%s]'%(l, ', '.join('"%s"'%str(t) for t in defined[l])) for l in LANGUAGES]))
+
+            for l in LANGUAGES:
+                self.translations[l].update(add['translations'][l])
+
+    def update(self, update):
+        if 'inhibitions' in update:
+            for s, l in update['inhibitions'].items():
+                if self.inhibition(s) is not None:
+                    self.inhibitions[s] = l
+
+        if 'translations' in update:
+            for l in LANGUAGES:
+                self.translations[l].update(update['translations'][l])
+
+        if 'terms' in update:
+            roots = {t for t in update['terms'] if self.has_root(t)}
+            for t_old in update['terms']:
+                self._set_term(t_old, False)
+                self._set_root(t_old, False)
+
+            for t_old, t_new in update['terms'].items():
+                # a modify is like an add and delete.
+                self.history[t_old] = '-'
+                self.history[t_new] = '+'
+
+                self.diff[t_old] = t_new
+                self._set_term(t_new, True)
+                if t_old in roots:
+                    self._set_root(t_new, True)
+
+                for l in LANGUAGES:
+                    translation = self.translation(l, t_old)
+                    if translation is None:
+                        raise KeyError(t_old)
+                    self.translations[l][t_new] = translation
+                    self.translations[l][t_old] = None
+
+                inhibition = self.inhibition(t_old)
+                if inhibition is not None:
+                    self.inhibitions[t_new] = inhibition
+                    self.inhibitions[t_old] = None
+
+    def materialize(self, version):
+        """
+        :return: the state (see DictionaryVersion.__setstate__) of `version`,
+        the base with this changeset applied
+        """
+        base = self.base
+        base.load()
+        return {
+            'version': _date_to_str(version.date),
+            'terms': [t for t in base.terms if self.terms.get(t, True)] +
+                     [t for t, present in self.terms.items() if present],
+            'roots': [t for t in base.roots if self.roots.get(t, True)] +
+                     [t for t, present in self.roots.items() if present],
+            'inhibitions': _overlay(base.inhibitions, self.inhibitions),
+            'translations': {l: _overlay(tr, self.translations.get(l, {})) for l, tr in base.translations.items()},
+            'diff': {**base.diff, str(base): self.diff},
+            'history': {**base.history, str(version): self.history}
+        }
+
+    def __getstate__(self):
+        return {
+            'base': str(self.base),
+            'terms': self.terms,
+            'roots': self.roots,
+            'inhibitions': self.inhibitions,
+            'translations': self.translations,
+            'diff': self.diff,
+            'history': self.history
+        }
+
+    def __setstate__(self, state):
+        self.base = DictionaryVersion(state['base'])
+        self.terms = state['terms']
+        self.roots = state['roots']
+        self.inhibitions = state['inhibitions']
+        self.translations = state['translations']
+        self.diff = state['diff']
+        self.history = state['history']
+        self._base_sets = None
+
+    def save(self, version):
+        # persist as changeset_<version>.json in the versions folder
+        path = _version_file('changeset', version, ext='json')
+        with open(path + '.tmp', 'w') as fp:
+            json.dump(self.__getstate__(), fp)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def read(cls, version):
+        # the changeset saved for `version`, None if there is none
+        try:
+            with open(_version_file('changeset', version, ext='json')) as fp:
+                state = json.load(fp)
+        except FileNotFoundError:
+            return None
+        changeset = cls.__new__(cls)
+        changeset.__setstate__(state)
+        return changeset
+
+
+def _new_version_date(last_date):
+    # version names have a one second resolution: the new date must follow
+    # `last_date` and any version already known to this process
+    last_date = max([last_date, *DictionaryVersionSingleton._instances])
+    new_date = datetime.datetime.utcnow().replace(microsecond=0)
+    return max(new_date, last_date + datetime.timedelta(seconds=1))
+
+
+def create_dictionary_version(old_version=None, add=None, update=None, remove=None, diff=None, check=True):
     """
 
     :param old_version: the dictionary version to build the new version from
@@ -303,156 +817,165 @@ def create_dictionary_version(old_version=None, add=None, update=None, remove=No
     :param update: a dict to update the translations and inhibtions or the terms (new mapping)
             map terms|inhibitions|translations -> old -> new
     :param remove: a list of term to remove, they are removed from root, terms, inhibitions and translations
-    :return:
+    :param check: build the Dictionary of the new version now, recomputing the relations of the
+            root paradigms the changes touch only (raises if the new version is incoherent), and cache it.
+            Otherwise the new version is only materialized when first loaded.
+    :return: the new version, stored as a Changeset over `old_version`
     """
     v = latest_dictionary_version()
-    last_date = v.date
-
-    while True:
-        new_date = datetime.datetime.utcnow()
-        if new_date != last_date:
-            break
-
-    new_version_name = version_name(new_date)
+    new_date = _new_version_date(v.date)
 
     if old_version is None:
         old_version = v
 
-    old_version.load()
-
-    state = {
-        'version': _date_to_str(new_date),
-        'terms': copy.deepcopy(old_version.terms),
-        'roots': copy.deepcopy(old_version.roots),
-        'inhibitions': copy.deepcopy(old_version.inhibitions),
-        'translations': copy.deepcopy(old_version.translations),
-        'diff': {**copy.deepcopy(old_version.diff),
-                 str(old_version): diff if diff else {}},
-        'history': {**copy.deepcopy(old_version.history),
-                    new_version_name: {}}
-    }
-
-    # if merge is not None:
-    #     for m_version in merge:
-    #         m_version.load()
-    #
-    #         terms_to_add = set(m_version.terms).difference(state['terms'])
-    #         roots_to_add = set(m_version.roots).difference(state['roots'])
-    #
-    #         state['terms'].extend(terms_to_add)
-    #         state['roots'].extend(roots_to_add)
-    #         state['inhibitions'].update({r: m_version.inhibitions[r] for r in roots_to_add if r in m_version.inhibitions})
-    #         for l in LANGUAGES:
-    #             state['translations'][l].update({s: m_version.translations[l][s] for s in terms_to_add})
-
+    changeset = Changeset(old_version, diff)
     if remove is not None:
-        state['terms'] = list(set(state['terms']).difference(remove))
-        state['roots'] = list(set(state['roots']).difference(remove))
-        for r in remove:
-            if r in state['inhibitions']:
-                del state['inhibitions'][r]
+        changeset.remove(remove)
+    if add is not None:
+        changeset.add(add)
+    if update is not None:
+        changeset.update(update)
 
-            for l in LANGUAGES:
-                if r in state['translations'][l]:
-                    del state['translations'][l][r]
+    dictionary_version = DictionaryVersion(new_date)
+    dictionary_version.changeset = changeset
 
-            state['diff'][str(old_version)][r] = None
-            state['history'][new_version_name][r] = '-'
+    if check:
+        build_changeset_dictionary(dictionary_version)
 
-    if add is not None:
-        if 'terms' in add:
-            state['terms'] = list(set(state['terms']).union(add['terms']))
-            for t in add['terms']:
-                state['history'][new_version_name][t] = '+'
+    changeset.save(dictionary_version)
+    return dictionary_version
 
-        if 'roots' in add:
-            state['roots'] = list(set(state['roots']).union(add['roots']))
-            for t in add['roots']:
-                state['history'][new_version_name][t] = '+'
 
-        if 'inhibitions' in add:
-            if set(state['inhibitions']).intersection(set(add['inhibitions'])):
-                raise ValueError("Error in creating a new dictionary versions, trying to add multiples "
-                                 "inhibitions rules for the same script.")
+class _RootsView:
+    # A dictionary restricted to some of its root paradigms, for the
+    # relations RelationsGraph computes root paradigm by root paradigm
+    def __init__(self, dictionary, roots):
+        self.dictionary = dictionary
+        self.roots = {r: terms for r, terms in dictionary.roots.items() if str(r.script) in roots}
 
-            state['inhibitions'] = {**state['inhibitions'], **add['inhibitions']}
-        if 'translations' in add:
-            if any(set(state['translations'][l]).intersection(set(add['translations'][l])) for l in LANGUAGES):
-                raise ValueError("Error in creating a new dictionary version, trying to add multiples "
-                                 "translation for the script {%s}. Those script may already exists in the dictionary."%', '.join(['"%s": [%s]'%(l, ', '.join('"%s"'%str(t) for t in set(state['translations'][l]).intersection(set(add['translations'][l])))) for l in LANGUAGES]))
+    def __getattr__(self, item):
+        return getattr(self.dictionary, item)
 
-            state['translations'] = {l: {**state['translations'][l], **add['translations'][l]} for l in LANGUAGES}
+    def __len__(self):
+        return len(self.dictionary)
 
-    if update is not None:
-        if 'inhibitions' in update:
-            for s, l in update['inhibitions'].items():
-                if s not in state['inhibitions']:
-                    continue
-                state['inhibitions'][s] = l
+    def __iter__(self):
+        return (t for t in self.dictionary.index if t.root in self.roots)
 
-        if 'translations' in update:
-            state['translations'] = {l: {**state['translations'][l], **update['translations'][l]} for l in LANGUAGES}
 
-        if 'terms' in update:
-            state['terms'] = set(t for t in state['terms'] if t not in update['terms'])
+def _affected_roots(old, new):
+    """
+    Root paradigms (str) of `new` or `old` whose terms or inhibitions differ
+    between the two dictionaries.
+    """
+    affected = set()
+    for t in old.index:
+        t_new = new.terms.get(t.script)
+        if t_new is None or t_new.root.script != t.root.script:
+            affected.add(str(t.root.script))
+            if t_new is not None:
+                affected.add(str(t_new.root.script))
+    affected.update(str(t.root.script) for t in new.index if t.script not in old.terms)
 
-            roots = set(state['roots']).intersection(update['terms'])
-            state['roots'] = set(t for t in state['roots'] if t not in update['terms'])
+    old_inhibitions = old.version.inhibitions
+    new_inhibitions = new.version.inhibitions
+    affected.update(r for r in set(old_inhibitions) | set(new_inhibitions)
+                    if old_inhibitions.get(r) != new_inhibitions.get(r))
+    return affected
 
-            for t_old in update['terms']:
-                t_new = update['terms'][t_old]
 
-                # a modify is like an add and delete.
-                state['history'][new_version_name][t_old] = '-'
-                state['history'][new_version_name][t_new] = '+'
+# Relations between the terms of a single root paradigm
+_ROOT_RELATIONS = ['contains', 'contained', 'opposed', 'associated', 'crossed', 'twin'] + \
+                  ['table_%d' % i for i in range(6)]
 
-                state['diff'][str(old_version)][t_old] = t_new
-                state['terms'].add(t_new)
 
-                if t_old in roots:
-                    state['roots'].add(t_new)
+def _revalidate_relations(old, new):
+    """
+    The relations of `new`, a Dictionary populated without relations, from
+    those of `old`: the relations inside the root paradigms left untouched
+    are carried over, those of the affected root paradigms are recomputed,
+    and the father/child relations (which cross root paradigms) are
+    recomputed for every term.
+    :return: map relation type -> csr matrix, as in RelationsGraph
+    """
+    affected = _affected_roots(old, new)
+    logger.log(logging.INFO, "Recomputing relations of %d root paradigms" % len(affected))
 
-                for l in LANGUAGES:
-                    state['translations'][l][t_new] = state['translations'][l][t_old]
-                    del state['translations'][l][t_old]
+    # index in old -> index in new, for the terms of untouched root paradigms
+    remap = np.full(len(old), -1, dtype=np.int64)
+    for t in old.index:
+        if str(t.root.script) not in affected:
+            remap[t.index] = new.terms[t.script].index
 
-                if t_old in state['inhibitions']:
-                    state['inhibitions'][t_new] = state['inhibitions'][t_old]
-                    del state['inhibitions'][t_old]
+    shape = (len(new), len(new))
 
-            state['terms'] = list(state['terms'])
-            state['roots'] = list(state['roots'])
+    def carried(reltype):
+        m = old.relations_graph.relations[reltype].tocoo()
+        i, j = remap[m.row], remap[m.col]
+        keep = (i >= 0) & (j >= 0) & (m.data != 0)
+        return coo_matrix((np.ones(keep.sum(), dtype=bool), (i[keep], j[keep])), shape=shape)
 
-    dictionary_version = DictionaryVersion(new_date)
-    dictionary_version.__setstate__(state)
+    graph = RelationsGraph.__new__(RelationsGraph)
+    graph.dictionary = _RootsView(new, affected)
 
-    from ieml.dictionary import Dictionary
+    relations = {}
+    relations['contains'] = csr_matrix(carried('contains') + graph._compute_contains(), dtype=bool)
+    relations['contained'] = csr_matrix(relations['contains'].transpose())
 
-    if set(old_version.terms) == set(state['terms']) and set(old_version.roots) == set(state['roots']) and \
-       all(old_version.inhibitions[s] == state['inhibitions'][s] for s in old_version.inhibitions):
+    siblings = graph._compute_siblings()
+    for i, reltype in enumerate(['opposed', 'associated', 'crossed', 'twin']):
+        relations[reltype] = carried(reltype) + siblings[i]
 
-        old_dict_state = Dictionary(old_version).__getstate__()
+    table = graph._compute_table_rank(relations['contained'])
+    for i in range(6):
+        relations['table_%d' % i] = carried('table_%d' % i) + table[i]
 
-        d = Dictionary.__new__(Dictionary)
-        rel_graph = RelationsGraph.__new__(RelationsGraph)
-        rel_graph.__setstate__({
-            'dictionary': d,
-            'relations': old_dict_state['relations'].__getstate__()['relations']
-        })
+    graph.dictionary = new
+    father = graph._compute_father()
+    for i, r in enumerate(['_substance', '_attribute', '_mode']):
+        relations['father' + r] = father[i]
+        relations['child' + r] = father[i].transpose()
 
-        state = {
-            'version': dictionary_version,
-            'relations': rel_graph,
-            'scripts': old_dict_state['scripts'],
-        }
+    relations['identity'] = identity(len(new), format='csr')
 
-        d.__setstate__(state)
-        save_dictionary_to_cache(d)
-    else:
-        # graph is updated, must check the coherence
-        Dictionary(dictionary_version)
+    return {reltype: csr_matrix(relations[reltype], dtype=relations[reltype].dtype) for reltype in RELATIONS}
 
-    return dictionary_version
+
+def build_changeset_dictionary(version):
+    """
+    Build, check and cache the Dictionary of a version created from a
+    Changeset, from the Dictionary of its base (built the same way first if
+    the base is an uncached changeset version too), recomputing the
+    relations of the affected root paradigms only.
+    :return: the Dictionary
+    """
+    from ieml.dictionary import Dictionary
+    from ieml.dictionary.script import script
+
+    changeset = version.changeset
+    base = changeset.base
+    if base.changeset is not None and not base.is_cached:
+        build_changeset_dictionary(base)
+    old = Dictionary(base)
+
+    version.load()
+    scripts = sorted([s for s in old.scripts if changeset.terms.get(str(s), True)] +
+                     [script(t) for t, present in changeset.terms.items() if present])
+
+    d = Dictionary.__new__(Dictionary)
+    d.version = version
+    # an empty relation list skips the relation graph, computed below
+    d._populate(scripts=scripts, relations=())
+
+    rel_graph = RelationsGraph.__new__(RelationsGraph)
+    rel_graph.__setstate__({
+        'dictionary': d,
+        'relations': _revalidate_relations(old, d)
+    })
+    d.relations_graph = rel_graph
+
+    save_dictionary_to_cache(d)
+    return d
 
 
 def save_dictionary_to_cache(dictionary):
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Fill the versions folder ahead of time, so that loading a dictionary version
+never waits on the network (loads only read the folder and the mirror): refresh
+the version listing, fetch the version files in parallel (hash checked, from
+the mirror or the bucket), then
+precompile each version's Dictionary cache, composed diff and phonetic
+mapping. Versions are compiled one per process, ieml keeping a single
+Dictionary per process.
+
+Run with IEML_OFFLINE=1 on an air-gapped node to fill it from
+IEML_VERSIONS_MIRROR only.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+
+from ieml.dictionary.version import DictionaryVersion, fetch_version_file, get_available_dictionary_version
+
+
+def compile_version(name):
+    from ieml.dictionary import Dictionary
+
+    start = time.perf_counter()
+    version = DictionaryVersion(name)
+    if not version.is_cached:
+        Dictionary(version)
+    version.composed_diff()
+    version.get_phonetic_mapping()
+    return time.perf_counter() - start
+
+
+def run(pool, fn, names, action, done_label):
+    # fn(name) for every name on the pool; :return: the names that succeeded
+    done = []
+    futures = {pool.submit(fn, name): name for name in names}
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"  {name}: {action} failed: {e}", file=sys.stderr)
+            continue
+        done.append(name)
+        suffix = f" in {result:.1f} s" if isinstance(result, float) else ''
+        print(f"  {name}: {done_label}{suffix}")
+    return [name for name in names if name in done]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("versions", nargs="*", help="versions to prefetch (default: the latest ones)")
+    ap.add_argument("--latest", type=int, default=1, help="number of latest versions to prefetch")
+    ap.add_argument("--all", action="store_true", help="prefetch every available version")
+    ap.add_argument("--workers", type=int, default=4, help="concurrent downloads and compilations")
+    ap.add_argument("--no-refresh", action="store_true", help="use the cached version listing")
+    ap.add_argument("--no-compile", action="store_true", help="only fetch the version files")
+    args = ap.parse_args()
+
+    available = get_available_dictionary_version(refresh=not args.no_refresh, network=True)
+    if args.versions:
+        names = [str(DictionaryVersion(v)) for v in args.versions]
+    else:
+        names = available if args.all else available[:args.latest]
+    print(f"{len(available)} versions available, prefetching {len(names)}")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        fetched = run(pool, partial(fetch_version_file, network=True), names, "fetch", "fetched")
+    compiled = fetched
+    if not args.no_compile and fetched:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(fetched))) as pool:
+            compiled = run(pool, compile_version, fetched, "compile", "compiled")
+
+    if len(compiled) < len(names):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ieml keeps its versions folder in ~/.ieml and the REPL its caches in ~:
+# keep the tests out of the real home directory
+os.environ["HOME"] = tempfile.mkdtemp(prefix="ieml-tests-")
+os.environ["IEML_CACHE"] = ""
+
+DICTIONARY_VERSION = "dictionary_2020-01-01_00:00:00"
+ROOTS = ["E:", "U:", "A:", "S:", "B:", "T:", "O:M:.", "M:M:.", "O:O:."]
+
+
+@pytest.fixture(scope="session")
+def dictionary():
+    """
+    A small dictionary version, written to the versions folder: a few root
+    paradigms and all their cells, glossed "<lang> <script>".
+    """
+    pytest.importorskip("scipy")
+    pytest.importorskip("ieml")
+    from ieml.constants import LANGUAGES
+    from ieml.dictionary import Dictionary
+    from ieml.dictionary.script import script
+    from ieml.dictionary.version import VERSIONS_FOLDER, DictionaryVersion
+
+    terms = set()
+    for root in ROOTS:
+        s = script(root)
+        terms.add(str(s))
+        terms.update(str(ss) for ss in s.singular_sequences)
+    terms = sorted(terms)
+    roots = [str(script(r)) for r in ROOTS]
+    state = {
+        "version": DICTIONARY_VERSION.split("_", 1)[1],
+        "terms": terms,
+        "roots": roots,
+        "inhibitions": {r: [] for r in roots},
+        "translations": {lang: {t: f"{lang} {t}" for t in terms} for lang in LANGUAGES},
+        "diff": {},
+    }
+    with open(os.path.join(VERSIONS_FOLDER, DICTIONARY_VERSION + ".json"), "w") as fp:
+        json.dump(state, fp)
+    return Dictionary(DictionaryVersion(DICTIONARY_VERSION))
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def ieml_auto(dictionary):
+    # ieml_api loads the default version (the test dictionary) on import
+    import ieml_auto
+    return ieml_auto
+
+
+class StreamingClient:
+    # generate(stream=True) answering with the given chunks
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate(self, model, prompt, stream=False):
+        return (SimpleNamespace(response=text) for text in self.chunks)
+
+
+def test_first_token_recorded_after_empty_chunks(ieml_auto, monkeypatch):
+    monkeypatch.setattr(ieml_auto, "_client", SimpleNamespace(get=lambda: StreamingClient(["", "", "[", "]"])))
+    monkeypatch.setattr(ieml_auto, "response_cache", None)
+    monkeypatch.setattr(ieml_auto, "first_token_ms", ieml_auto.deque(maxlen=10))
+    assert "".join(ieml_auto.stream_ieml_raw("water", ["E:"])) == "[]"
+    assert len(ieml_auto.first_token_ms) == 1
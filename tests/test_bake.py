@@ -0,0 +1,154 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("ollama")
+pytest.importorskip("ieml")
+
+from ollama import Client
+
+from bake_embeddings import Checkpoint, embed_glosses, gloss_hash, gloss_key, plan_incremental
+from ollama_stub import OllamaStub
+
+ITEMS = [(f"E:U:{'SBTUAE'[i % 6]}:.{i}", f"gloss {i}") for i in range(10)]
+
+
+@pytest.fixture
+def stub():
+    stub = OllamaStub(dim=8).start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+def embed(stub, checkpoint, items=ITEMS, client=None, **kw):
+    return embed_glosses(client or Client(host=stub.url), items, checkpoint, batch_size=3, out=io.StringIO(), **kw)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FailingClient:
+    # an Ollama client dropping out after `batches` embed requests
+    def __init__(self, url, batches):
+        self.client = Client(host=url)
+        self.batches = batches
+
+    def embed(self, **kw):
+        if not self.batches:
+            raise Interrupted
+        self.batches -= 1
+        return self.client.embed(**kw)
+
+
+def test_glosses_are_sent_in_batches(stub):
+    embeddings = embed(stub, Checkpoint(None, "m"))
+    # 10 glosses in batches of 3
+    assert stub.calls["/api/embed"] == 4
+    assert len(embeddings) == len(ITEMS) and all(len(e) == 8 for e in embeddings)
+
+
+def test_interrupted_bake_resumes_from_checkpoint(stub, tmp_path):
+    path = str(tmp_path / "ckpt.jsonl")
+    with pytest.raises(Interrupted):
+        embed(stub, Checkpoint(path, "m"), client=FailingClient(stub.url, 2), workers=1)
+    assert stub.calls["/api/embed"] == 2
+
+    # whole batches were checkpointed (the ones collected before the failure)
+    checkpoint = Checkpoint(path, "m")
+    done = len(checkpoint.vectors)
+    assert done in (3, 6)
+    embeddings = embed(stub, checkpoint)
+    # only the glosses left are embedded
+    assert stub.calls["/api/embed"] == 2 + -(-(len(ITEMS) - done) // 3)
+    assert embeddings == embed(stub, Checkpoint(None, "m"))
+
+
+def test_embedded_glosses_are_skipped(stub, tmp_path):
+    path = str(tmp_path / "ckpt.jsonl")
+    first = embed(stub, Checkpoint(path, "m"))
+    calls = stub.calls["/api/embed"]
+    assert embed(stub, Checkpoint(path, "m")) == first
+    assert stub.calls["/api/embed"] == calls
+
+    # a changed gloss is embedded again, alone
+    changed = ITEMS[:-1] + [(ITEMS[-1][0], "another gloss")]
+    embed(stub, Checkpoint(path, "m"), items=changed)
+    assert stub.calls["/api/embed"] == calls + 1
+    assert gloss_key(*changed[-1]) in Checkpoint(path, "m")
+
+
+class FakeEmbedder:
+    # an in-process embed client: the vector is derived from the gloss text
+    def __init__(self, fail_after=None):
+        self.inputs = []
+        self.fail_after = fail_after
+
+    def embed(self, model, input):
+        if self.fail_after is not None and len(self.inputs) == self.fail_after:
+            raise Interrupted
+        self.inputs.append(list(input))
+        return SimpleNamespace(embeddings=[[float(len(g)), float(sum(map(ord, g)))] for g in input])
+
+
+def test_resume_after_gloss_change(tmp_path):
+    path = str(tmp_path / "ckpt.jsonl")
+    with pytest.raises(Interrupted):
+        embed_glosses(FakeEmbedder(fail_after=2), ITEMS, Checkpoint(path, "m"),
+                      batch_size=3, workers=1, out=io.StringIO())
+    done = set(Checkpoint(path, "m").vectors)
+    assert len(done) == 6
+
+    # two glosses change before the bake is resumed, one already embedded
+    changed = {ITEMS[0][0]: "a new gloss", ITEMS[8][0]: "another new gloss"}
+    items = [(code, changed.get(code, gloss)) for code, gloss in ITEMS]
+    client = FakeEmbedder()
+    checkpoint = Checkpoint(path, "m")
+    embeddings = embed_glosses(client, items, checkpoint, batch_size=3, out=io.StringIO())
+
+    todo = [gloss for code, gloss in items if gloss_key(code, gloss) not in done]
+    assert sorted(g for batch in client.inputs for g in batch) == sorted(todo)
+    assert "a new gloss" in todo
+    assert embeddings == FakeEmbedder().embed("m", [gloss for _, gloss in items]).embeddings
+
+    # compaction drops the vector of the stale gloss
+    keys = [gloss_key(code, gloss) for code, gloss in items]
+    checkpoint.compact(keys)
+    assert sorted(Checkpoint(path, "m").vectors) == sorted(keys)
+    assert gloss_key(*ITEMS[0]) not in Checkpoint(path, "m")
+
+
+def _versions(*states):
+    from ieml.dictionary.version import DictionaryVersion
+
+    versions = []
+    for state in states:
+        v = DictionaryVersion(state["version"])
+        v.__setstate__({"roots": [], "inhibitions": {}, "translations": {}, **state})
+        versions.append(v)
+    return versions
+
+
+def test_plan_incremental_across_versions():
+    v1, v2, v3 = (f"dictionary_1991-01-0{n}_00:00:00" for n in (1, 2, 3))
+    # v2 renames a and adds f, v3 renames a again, removes b and adds g
+    old, _, new = _versions(
+        {"version": v1[11:], "terms": list("abcde"), "diff": {}},
+        {"version": v2[11:], "terms": ["a2", "b", "c", "d", "e", "f"],
+         "diff": {v1: {"a": "a2"}}},
+        {"version": v3[11:], "terms": ["a3", "c", "d", "e", "f", "g"],
+         "diff": {v1: {"a": "a2"}, v2: {"a2": "a3", "b": None}},
+         "history": {v1: {t: "+" for t in "abcde"}, v2: {"a2": "+", "a": "-", "f": "+"},
+                     v3: {"a3": "+", "a2": "-", "b": "-", "g": "+"}}},
+    )
+    glosses = {t: f"gloss {t}" for t in "abcde"}
+    store = SimpleNamespace(codes=list("abcde"),
+                            gloss_hashes=[gloss_hash(glosses[t]) for t in "abcde"])
+    en_map = {"a3": glosses["a"], "c": "a new gloss", "d": glosses["d"], "e": glosses["e"],
+              "f": "gloss f", "g": "gloss g"}
+
+    reuse, summary = plan_incremental(store, old, new, en_map)
+    assert reuse == {"a3": 0, "d": 3, "e": 4}
+    assert summary == {"reused": 2, "renamed": 1, "reglossed": 1, "removed": 1, "added": 2}
@@ -0,0 +1,48 @@
+import importlib.util
+import io
+import json
+import os
+
+import pytest
+
+from ieml_terms import UNKNOWN_COMMAND
+
+
+@pytest.fixture(scope="module")
+def repl(dictionary):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ieml-repl.py")
+    spec = importlib.util.spec_from_file_location("ieml_repl", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_auto_and_search_without_query_are_errors(repl):
+    out = io.StringIO()
+    repl.run_batch(["auto", "search", "index 0"], out)
+    records = {r["line"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert records[1]["command"] == "auto" and records[1]["result"] == {"error": UNKNOWN_COMMAND}
+    assert records[2]["command"] == "search" and records[2]["result"] == {"error": UNKNOWN_COMMAND}
+    assert records[3]["result"]["index"] == 0
+
+
+def test_auto_failure_degrades_to_error_records(repl, monkeypatch, capsys):
+    import ieml_pipeline
+    calls = []
+
+    def auto_batch(concepts, k=15, concurrency=4):
+        calls.append((concepts, k))
+        yield {"concept": concepts[0], "selection": []}
+        raise ConnectionError("ollama down")
+
+    monkeypatch.setattr(ieml_pipeline, "auto_batch", auto_batch)
+    out = io.StringIO()
+    repl.run_batch(["auto k=3 water", "search en E", "auto k=3 fire", "auto k=3 earth", "auto air",
+                    "auto k=0 air"], out)
+    records = {r["line"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert sorted(calls) == [(["air"], 15), (["water", "fire", "earth"], 3)]
+    assert records[1]["result"] == {"concept": "water", "selection": []}
+    assert "ollama down" in records[3]["result"]["error"] and "ollama down" in records[4]["result"]["error"]
+    assert records[2]["result"]["matches"]
+    assert "positive" in records[6]["result"]["error"]
+    assert "search" in capsys.readouterr().err
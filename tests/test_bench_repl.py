@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bench_repl import COMMANDS, HERE, _inputs, synthetic_snapshot
+from ieml_snapshot import Snapshot
+from ieml_terms import TermTable
+
+
+def test_inputs_without_glosses_leave_out_word_commands():
+    inputs = _inputs(["E:U:S:."], [], [1], 3, seed=0)
+    assert "parse" in inputs and "dump" in inputs
+    assert not {"search", "top_primitives", "auto", "semsearch"} & set(inputs)
+    assert _inputs([], [], [], 3, seed=0) == {}
+
+
+def test_inputs_cover_every_command():
+    assert set(_inputs(["E:U:S:."], ["act of doing"], [1], 3, seed=0)) == set(COMMANDS)
+
+
+def test_synthetic_codes_are_scripts(tmp_path):
+    script = pytest.importorskip("ieml.dictionary.script").script
+    synthetic_snapshot(str(tmp_path / "snapshot"), 50)
+    table = TermTable(Snapshot(str(tmp_path / "snapshot")))
+    assert len(set(table.codes)) == 50
+    for code, layer in zip(table.codes, table.layers.tolist()):
+        # valid scripts of the recorded layer (the parser may shorten them to a canonical form)
+        assert script(code).layer == layer
+
+
+def test_synthetic_workload_needs_no_installed_version(tmp_path):
+    pytest.importorskip("ieml")
+    env = {**os.environ, "HOME": str(tmp_path)}
+    out = subprocess.run([sys.executable, os.path.join(HERE, "bench_repl.py"), "--synthetic", "200",
+                          "--iterations", "3", "--commands", "parse", "index", "neighbors", "dump", "--json"],
+                         env=env, cwd=str(tmp_path), capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr
+    assert set(json.loads(out.stdout)["workloads"]["synthetic_200"]["commands"]) == {
+        "parse", "index", "neighbors", "dump"}
@@ -0,0 +1,115 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import ieml_cache
+from ieml_cache import EmbeddingCache, ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # a settable time.time() for ieml_cache
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(ieml_cache, "time", SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    cache.put("k", "response")
+    clock.t += 59
+    assert cache.get("k") == "response"
+    clock.t += 2
+    assert cache.get("k") is None
+    assert cache.get_or_compute("k", lambda: "fresh") == "fresh"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=5)
+    # the bound is checked every 32 writes
+    for i in range(33):
+        clock.t += 1
+        cache.put(f"k{i}", f"r{i}")
+        if i == 31:
+            # the oldest entry, read just before the check, is kept
+            clock.t += 1
+            cache.get("k0")
+    (count,) = cache._conn().execute("SELECT COUNT(*) FROM responses").fetchone()
+    assert count == 5
+    assert cache.get("k0") == "r0" and cache.get("k32") == "r32"
+    assert cache.get("k1") is None
+
+
+def test_embeddings_are_evicted_on_overflow(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=5)
+
+    def count():
+        return cache._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    for i in range(5):
+        clock.t += 1
+        cache.put("m", f"text {i}", [i, 0])
+    clock.t += 1
+    assert cache.get("m", "Text  0").tolist() == [0, 0]
+    for i in range(5, 8):
+        clock.t += 1
+        cache.put("m", f"text {i}", [i, 0])
+        assert count() == 5
+    # a rewritten entry takes no room
+    cache.put("m", "text 7", [7, 1])
+    assert count() == 5
+
+    assert cache.get("m", "text 0") is not None
+    assert all(cache.get("m", f"text {i}") is None for i in (1, 2, 3))
+    assert cache.get("m", "text 7").tolist() == [7, 1]
+    assert cache.stats() == {"hits": 3, "misses": 3, "hit_rate": 0.5}
+
+
+def test_embed_computes_on_miss_only(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    computed = []
+
+    def compute(text):
+        computed.append(text)
+        return [1.0, 2.0]
+
+    assert cache.embed("m", "Water", compute).tolist() == [1.0, 2.0]
+    assert cache.embed("m", "water ", compute).tolist() == [1.0, 2.0]
+    assert cache.embed("other", "water", compute).tolist() == [1.0, 2.0]
+    assert computed == ["Water", "water"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_concurrent_misses_make_one_generate_request(tmp_path):
+    ollama = pytest.importorskip("ollama")
+    from ollama_stub import OllamaStub
+
+    stub = OllamaStub(latency=0.2).start()
+    try:
+        client = ollama.Client(host=stub.url)
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+        key = ResponseCache.key("model", 1, "water", ["E:"])
+
+        def generate():
+            return client.generate(model="model", prompt='{"code": "E:"}').response
+
+        start = threading.Barrier(8)
+        results = []
+
+        def call():
+            start.wait()
+            results.append(cache.get_or_compute(key, generate))
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    assert stub.calls["/api/generate"] == 1
+    assert len(results) == 8 and len(set(results)) == 1
+    assert cache.coalesced == 7
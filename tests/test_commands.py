@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def commands(dictionary):
+    import ieml_commands
+    return ieml_commands
+
+
+@pytest.mark.parametrize("page", ["0", "00", "-1", "x", ""])
+def test_page_must_be_positive(commands, page):
+    with pytest.raises(ValueError, match="positive"):
+        commands.parse_neighbour_options([f"page={page}"])
+    _, _, result = commands.run_command(f"neighbors E: page={page}")
+    assert "positive" in result["error"]
+
+
+def test_neighbour_options(commands):
+    assert commands.parse_neighbour_options(["page=2", "type=contains,opposed"]) == \
+        {"page": 2, "type": ["contains", "opposed"]}
+
+
+def test_auto_options(commands):
+    assert commands.parse_auto_args(["k=5", "deep", "water"]) == (5, "deep water")
+    assert commands.parse_auto_args(["water"]) == (commands.AUTO_K, "water")
+    _, _, result = commands.run_command("auto k=x water")
+    assert "positive" in result["error"]
+    assert commands.run_command("auto k=5")[2] == {"error": commands.UNKNOWN_COMMAND}
@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("ieml")
+
+from ieml_fuzzy import FuzzyIndex
+
+CODES = ["E:", "U:", "A:", "S:", "E:E:.", "E:U:.", "U:S:A:.", "E:E:E:.E:E:U:.-"]
+
+
+@pytest.mark.parametrize("code_form", [str, lambda code: f"[{code}]"])
+def test_suggests_scripts_differing_by_layer_marks(code_form):
+    index = FuzzyIndex([code_form(c) for c in CODES])
+    assert index.suggest("E:.")[0] == code_form("E:")
+    assert index.suggest("[E:E:]")[0] == code_form("E:E:.")
+    assert index.suggest("U:S:A:")[0] == code_form("U:S:A:.")
+
+
+def test_no_suggestions_for_unrelated_input():
+    assert FuzzyIndex(CODES).suggest("zzzz") == []
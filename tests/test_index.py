@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from ieml_index import FlatIndex, IVFIndex, build_index, load_index, save_index
+from ieml_retrieval import normalize_rows
+
+
+def _unit(rng, n, dim):
+    return normalize_rows(rng.standard_normal((n, dim)).astype(np.float32))
+
+
+@pytest.fixture
+def matrix():
+    return _unit(np.random.default_rng(0), 4000, 16)
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf"])
+def test_save_load_round_trip(tmp_path, matrix, kind):
+    index = build_index(matrix, kind, normalized=True)
+    path = tmp_path / "index.npz"
+    save_index(index, path)
+    loaded = load_index(path, matrix, normalized=True)
+
+    assert type(loaded) is type(index)
+    assert len(loaded) == len(index)
+    for key, value in index.state().items():
+        assert np.array_equal(loaded.state()[key], value)
+    for q in _unit(np.random.default_rng(1), 20, 16):
+        ids, scores = index.search(q, 10)
+        loaded_ids, loaded_scores = loaded.search(q, 10)
+        assert np.array_equal(loaded_ids, ids)
+        assert np.allclose(loaded_scores, scores)
+
+
+def test_load_rejects_other_matrix(tmp_path, matrix):
+    path = tmp_path / "index.npz"
+    save_index(IVFIndex(matrix, normalized=True), path)
+    with pytest.raises(ValueError, match="4000 rows"):
+        load_index(path, matrix[:-1], normalized=True)
+
+
+def test_ivf_recall_against_flat(matrix):
+    flat = FlatIndex(matrix, normalized=True)
+    ivf = IVFIndex(matrix, nprobe=16, normalized=True)
+    queries = _unit(np.random.default_rng(2), 100, 16)
+    recall = np.mean([
+        len(set(flat.search(q, 10)[0]) & set(ivf.search(q, 10)[0])) / 10
+        for q in queries])
+    assert recall >= 0.9
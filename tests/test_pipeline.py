@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def pipeline(dictionary, monkeypatch):
+    import ieml_pipeline
+
+    def embed_concepts(chunk):
+        if "unreachable" in chunk:
+            raise ConnectionError("embedder down")
+        return [[0.0] for _ in chunk]
+
+    def top_primitives(concept, k, vec=None):
+        if concept == "no candidates":
+            raise ValueError("retrieval failed")
+        return ["E:"]
+
+    monkeypatch.setattr(ieml_pipeline, "embed_concepts", embed_concepts)
+    monkeypatch.setattr(ieml_pipeline, "top_primitives", top_primitives)
+    monkeypatch.setattr(ieml_pipeline, "compose_selection",
+                        lambda concept, candidates: {"concept": concept, "selection": candidates})
+    return ieml_pipeline
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_failures_yield_error_records(pipeline, ordered):
+    concepts = ["water", "fire", "unreachable", "earth", "no candidates", "air"]
+    results = list(pipeline.auto_batch(concepts, batch_size=2, ordered=ordered))
+    by_concept = {r["concept"]: r for r in results}
+    assert len(results) == len(concepts) and set(by_concept) == set(concepts)
+    # the whole chunk of the failed embedding
+    assert by_concept["unreachable"]["error"] == by_concept["earth"]["error"] == "embedder down"
+    assert by_concept["no candidates"]["error"] == "retrieval failed"
+    assert all(by_concept[c]["selection"] == ["E:"] for c in ("water", "fire", "air"))
+    if ordered:
+        assert [r["concept"] for r in results] == concepts
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from ieml_relations import UNREACHABLE, RelationGraph
+
+#   0 - 1 - 2 - 3      6 - 7   (8 isolated)
+#       |       |
+#       4 ----- 5
+EDGES = [(0, 1), (1, 2), (2, 3), (1, 4), (4, 5), (3, 5), (6, 7)]
+N = 9
+
+
+def _csr(edges, n):
+    rows = [a for a, b in edges] + [b for a, b in edges]
+    cols = [b for a, b in edges] + [a for a, b in edges]
+    order = np.lexsort((cols, rows))
+    rows, cols = np.array(rows)[order], np.array(cols)[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+
+@pytest.fixture
+def graph():
+    return RelationGraph(*_csr(EDGES, N), cache_size=4)
+
+
+def test_distances(graph):
+    assert graph.distance(0, 0) == 0
+    assert graph.distance(0, 3) == 3
+    assert graph.distance(0, 5) == 3
+    assert graph.distance(2, 4) == 2
+    assert graph.distance(6, 7) == 1
+
+
+def test_paths_follow_edges(graph):
+    edges = set(EDGES) | {(b, a) for a, b in EDGES}
+    for j in range(6):
+        path = graph.path(0, j)
+        assert path[0] == 0 and path[-1] == j
+        assert len(path) - 1 == graph.distance(0, j)
+        assert all(step in edges for step in zip(path, path[1:]))
+    assert graph.path(0, 5) == [0, 1, 4, 5]
+
+
+def test_k_hop(graph):
+    assert graph.k_hop(0, 1) == [(1, 1)]
+    assert graph.k_hop(0, 2) == [(1, 1), (2, 2), (4, 2)]
+    assert {i for i, _ in graph.k_hop(0, 10)} == {1, 2, 3, 4, 5}
+    assert graph.k_hop(8, 3) == []
+
+
+def test_unreachable(graph):
+    assert graph.distance(0, 6) is None
+    assert graph.path(0, 8) is None
+    assert graph.bfs(0)[0][7] == UNREACHABLE
+
+
+def test_pairwise_matches_single_source(graph):
+    nodes = [0, 3, 5, 7, 8]
+    dist = graph.pairwise(nodes)
+    for a, i in enumerate(nodes):
+        for b, j in enumerate(nodes):
+            d = graph.distance(i, j)
+            assert dist[a, b] == (UNREACHABLE if d is None else d)
+
+
+def test_cache_is_bounded(graph):
+    for i in range(N):
+        graph.distance(i, 0)
+    assert len(graph._cache) == 4
+    # cached results are the ones a fresh graph computes
+    fresh = RelationGraph(*_csr(EDGES, N))
+    assert all(np.array_equal(graph.bfs(i)[0], fresh.bfs(i)[0]) for i in range(N))
+
+
+def test_matches_scipy_shortest_path():
+    sparse = pytest.importorskip("scipy.sparse")
+    csgraph = pytest.importorskip("scipy.sparse.csgraph")
+    rng = np.random.default_rng(0)
+    n = 200
+    edges = [tuple(e) for e in rng.integers(n, size=(300, 2)) if e[0] != e[1]]
+    indptr, indices = _csr(sorted(set(edges)), n)
+    graph = RelationGraph(indptr, indices)
+    matrix = sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+    expected = csgraph.shortest_path(matrix, unweighted=True, indices=[0, 1, 2])
+    for row, i in zip(expected, [0, 1, 2]):
+        got = graph.bfs(i)[0].astype(float)
+        got[got == UNREACHABLE] = np.inf
+        assert np.array_equal(got, row)
@@ -0,0 +1,66 @@
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from ieml_index import FlatIndex, IVFIndex
+from ieml_retrieval import CandidateRetriever, RetrievalStats, _pages, normalize_rows
+
+N = 500
+
+
+@pytest.mark.parametrize("n, pages", [
+    (0, [0]),
+    (10, [10]),
+    (32, [32]),
+    (100, [32, 64, 100]),
+    (128, [32, 64, 128]),
+    (600, [32, 64, 128, 256, 512, 600]),
+])
+def test_pages(n, pages):
+    assert list(_pages(n)) == pages
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return normalize_rows(np.random.default_rng(0).standard_normal((N, 16)))
+
+
+@pytest.fixture(scope="module")
+def valid():
+    mask = np.ones(N, dtype=bool)
+    mask[::3] = False
+    return mask
+
+
+def _retriever(vectors, valid, index):
+    codes = [f"C{i}" for i in range(N)]
+    return CandidateRetriever(codes, index, valid, embed=lambda concept: vectors[int(concept)])
+
+
+@pytest.mark.parametrize("make_index", [
+    lambda m: FlatIndex(m, normalized=True),
+    lambda m: IVFIndex(m, nprobe=2, normalized=True),
+])
+def test_candidates_follow_the_code_mask(vectors, valid, make_index):
+    retriever = _retriever(vectors, valid, make_index(vectors))
+    q = 7
+    ranked = [f"C{i}" for i in np.argsort(-(vectors @ vectors[q]), kind="stable") if valid[i]]
+
+    codes = list(retriever.candidates(str(q)))
+    # every valid row exactly once, across page and (for IVF) rescan boundaries
+    assert sorted(codes) == sorted(ranked)
+    assert codes[0] == ranked[0] == f"C{q}"
+    if retriever.index.exact:
+        assert codes == ranked
+
+
+def test_stats_are_per_call(vectors, valid):
+    retriever = _retriever(vectors, valid, FlatIndex(vectors, normalized=True))
+    first, second = RetrievalStats(), RetrievalStats()
+    a = retriever.candidates("1", stats=first)
+    b = retriever.candidates("2", vec=vectors[2], stats=second)
+    # interleaved queries on one retriever keep their own counters
+    assert len(list(islice(a, 5))) == len(list(islice(b, 5))) == 5
+    assert (first.embed_calls, second.embed_calls) == (1, 0)
+    assert first.rows_scored == second.rows_scored == N
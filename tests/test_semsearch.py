@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from bench_repl import synthetic_snapshot
+from ieml_index import FlatIndex
+from ieml_search import SearchIndex
+from ieml_semsearch import SemanticSearch
+from ieml_snapshot import Snapshot
+from ieml_terms import TermTable
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "snapshot")
+    synthetic_snapshot(path, 300)
+    return TermTable(Snapshot(path))
+
+
+@pytest.fixture(scope="module")
+def vectors(table):
+    return np.random.default_rng(0).standard_normal((len(table), 16)).astype(np.float32)
+
+
+@pytest.mark.parametrize("code_form", [str, lambda code: f"[{code}]"])
+def test_hybrid_results_carry_both_scores(table, vectors, code_form):
+    # the embedding store may keep either code form, lexical hits must still line up
+    search = SemanticSearch([code_form(c) for c in table.codes], FlatIndex(vectors), np.ones(len(table), bool))
+    lexical = SearchIndex.from_table(table)
+    query = table.gloss(table.codes[5])
+    results = search.search(query, vectors[5], k=5, lexical=lexical)
+    assert results
+    code, score, cosine, lexical_score = results[0]
+    assert table.index_of(code) == 5
+    assert lexical_score is not None and cosine == pytest.approx(1.0, abs=1e-5)
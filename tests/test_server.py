@@ -0,0 +1,36 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def server(dictionary):
+    from ieml_server import CommandServer
+    server = CommandServer(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.url
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    try:
+        with urlopen(Request(f"{url}/command", data=body, method="POST"), timeout=10) as resp:
+            return resp.status, json.load(resp)
+    except HTTPError as e:
+        return e.code, json.load(e)
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"parse E:"', b"3", b'{"line": 3}', b'{"line": ["parse"]}',
+                                  b"{", b"{}"])
+def test_malformed_bodies_are_bad_requests(server, body):
+    status, payload = post(server, body)
+    assert status == 400 and payload["error"].startswith("bad request")
+
+
+def test_command(server):
+    status, payload = post(server, json.dumps({"line": "index 0"}).encode())
+    assert status == 200 and payload["command"] == "index"
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("scipy")
+pytest.importorskip("ieml")
+
+from ieml.constants import LANGUAGES
+from ieml.dictionary.script import script
+
+from ieml_snapshot import Snapshot, write_snapshot
+from ieml_terms import TermTable
+
+
+@pytest.fixture(scope="module")
+def table(dictionary, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "snapshot")
+    write_snapshot(dictionary, path)
+    return TermTable(Snapshot(path))
+
+
+def test_codes_are_bare_scripts(dictionary, table):
+    for t in dictionary.index:
+        assert table[t.index] == str(t.script)
+
+
+def test_every_term_has_its_glosses(dictionary, table):
+    for lang in LANGUAGES:
+        column = table.glosses(lang).tolist()
+        assert all(column)
+        assert column == [dictionary.translations[lang][code] for code in table.codes]
+
+
+def test_lookup_by_script(dictionary, table):
+    idx = dictionary.terms[script("E:")].index
+    assert table.index_of("E:") == idx
+    assert table.details(idx)["english"] == "en E:"
+
+
+def test_lookup_normalizes_codes(dictionary, table):
+    idx = dictionary.terms[script("E:")].index
+    for code in ("E:", "[E:]", " E: ", "[ E: ]", str(dictionary.terms[script("E:")])):
+        assert table.index_of(code) == idx
+
+
+def test_dump_columns_carry_glosses(table):
+    columns = table.columns(table.where(None), ("en", "fr"))
+    assert all(columns["en"].tolist()) and all(columns["fr"].tolist())
+
+
+def test_terms_are_not_their_own_neighbours(table):
+    from ieml_neighbours import NeighbourTable
+
+    neighbours = NeighbourTable(table.snapshot)
+    for idx in range(len(table)):
+        assert idx not in neighbours.row(idx)[0].tolist()
+        assert table.neighbour_counts[idx] == neighbours.page(idx)[2]
+    contains = neighbours.type_mask([t for t in neighbours.types if t.startswith("contain")])
+    assert table.index_of("A:") not in neighbours.row(table.index_of("A:"), contains)[0].tolist()
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+
+from ieml_store import (EmbeddingStore, codes_path, matrix_path, migrate_npz,
+                        save_store, store_exists)
+
+CODES = ["[E:]", "[U:]", "[A:]", "[U:]"]
+CLEAN = ["E:", "U:", "A:", "U:"]
+VALID = [True, True, True, False]
+
+
+def _embeddings(seed=0):
+    return np.random.default_rng(seed).standard_normal((len(CODES), 8)) * 5
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16])
+def test_round_trip(tmp_path, dtype):
+    prefix = str(tmp_path / "store")
+    embeddings = _embeddings()
+    save_store(prefix, CODES, embeddings, CLEAN, VALID, dtype=dtype,
+               gloss_hashes=["h0", "h1", "h2", "h3"], version="2020-01-01_00:00:00")
+
+    assert store_exists(prefix)
+    store = EmbeddingStore(prefix)
+    assert isinstance(store.matrix, np.memmap)
+    assert store.dtype == dtype
+    assert len(store) == len(CODES)
+    assert store.codes == CODES
+    assert store.clean_codes == CLEAN
+    assert store.valid.tolist() == VALID
+    assert store.gloss_hashes == ["h0", "h1", "h2", "h3"]
+    assert store.version == "2020-01-01_00:00:00"
+
+    expected = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    atol = 1e-6 if dtype == np.float32 else 1e-3
+    assert np.allclose(store.matrix.astype(np.float64), expected, atol=atol)
+
+
+def test_rejects_bad_input(tmp_path):
+    prefix = str(tmp_path / "store")
+    with pytest.raises(ValueError, match="dtype"):
+        save_store(prefix, CODES, _embeddings(), CLEAN, VALID, dtype=np.float64)
+    with pytest.raises(ValueError, match="codes"):
+        save_store(prefix, CODES[:-1], _embeddings(), CLEAN, VALID)
+    assert not store_exists(prefix)
+
+
+def test_replace_is_atomic(tmp_path, monkeypatch):
+    prefix = str(tmp_path / "store")
+    save_store(prefix, CODES, _embeddings(0), CLEAN, VALID)
+    reader = EmbeddingStore(prefix)
+    before = np.array(reader.matrix)
+
+    # an overwrite leaves no temporary files and is visible to new readers,
+    # while a reader that mapped the old file keeps seeing the old rows
+    save_store(prefix, CODES, _embeddings(1), CLEAN, VALID)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(p) for p in (matrix_path(prefix), codes_path(prefix)))
+    assert np.array_equal(reader.matrix, before)
+    assert not np.allclose(EmbeddingStore(prefix).matrix, before)
+
+    # a write failing halfway never touches the published store
+    current = np.array(EmbeddingStore(prefix).matrix)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "savez", fail)
+    with pytest.raises(OSError):
+        save_store(prefix, CODES, _embeddings(2), CLEAN, VALID)
+    assert np.array_equal(EmbeddingStore(prefix).matrix, current)
+
+
+def test_migrate_npz(tmp_path):
+    npz = str(tmp_path / "gloss_embeddings.npz")
+    embeddings = _embeddings()
+    np.savez(npz, codes=np.array(CODES, dtype=object), embeddings=embeddings,
+             clean_codes=np.array(CLEAN, dtype=object), valid=np.array(VALID))
+
+    prefix = migrate_npz(npz, dtype=np.float16)
+    assert prefix == str(tmp_path / "gloss_embeddings")
+    store = EmbeddingStore(prefix)
+    assert store.dtype == np.float16
+    assert store.codes == CODES
+    assert store.clean_codes == CLEAN
+    assert store.valid.tolist() == VALID
+    assert store.gloss_hashes is None and store.version is None
+    expected = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    assert np.allclose(store.matrix.astype(np.float64), expected, atol=1e-3)
+
+
+def test_migrate_npz_validates_codes(tmp_path, dictionary):
+    npz = str(tmp_path / "legacy.npz")
+    codes = ['"E:",', "U:", "not a term", "E:"]
+    np.savez(npz, codes=np.array(codes, dtype=object), embeddings=np.eye(4))
+
+    store = EmbeddingStore(migrate_npz(npz, prefix=str(tmp_path / "store")))
+    assert store.codes == codes
+    assert store.clean_codes == ["E:", "U:", "not a term", "E:"]
+    assert store.valid.tolist() == [True, True, False, False]
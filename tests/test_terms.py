@@ -0,0 +1,42 @@
+import pytest
+
+from bench_repl import synthetic_snapshot
+from ieml_search import SearchIndex
+from ieml_snapshot import Snapshot
+from ieml_terms import TermTable, parse_index_spec
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "snapshot")
+    synthetic_snapshot(path, 500)
+    return TermTable(Snapshot(path))
+
+
+def test_index_of_every_code(table):
+    for idx, code in enumerate(table.codes):
+        assert table.index_of(code) == idx
+    assert table.index_of("not a script") is None
+
+
+def test_search_index_resolves_term_indices(table):
+    index = SearchIndex.from_table(table)
+    assert len(index)
+    assert all(idx is not None for idx in index.indices)
+    code, idx, _, _ = index.search(table.gloss(table.codes[0]).split()[0])[0]
+    assert table.index_of(code) == idx
+
+
+def test_index_ranges_are_bounded(table):
+    assert parse_index_spec("1,3-5") == [1, 3, 4, 5]
+    assert parse_index_spec("498-999999999", limit=len(table)) == [498, 499]
+    with pytest.raises(ValueError):
+        parse_index_spec("500-600", limit=len(table))
+    with pytest.raises(ValueError):
+        parse_index_spec("3-")
+
+
+def test_index_of_normalizes_codes(table):
+    code = table.codes[7]
+    for variant in (code, f"[{code}]", f" {code} ", f"[ {code} ]\n"):
+        assert table.index_of(variant) == 7
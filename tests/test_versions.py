@@ -0,0 +1,167 @@
+import os
+
+import pytest
+
+version = pytest.importorskip("ieml.dictionary.version")
+if not hasattr(version, "fetch_version_file"):
+    pytest.skip("the patched version.py is not installed", allow_module_level=True)
+
+
+@pytest.fixture
+def no_bucket(monkeypatch):
+    def read_url(url):
+        raise AssertionError(f"request path contacted {url}")
+    monkeypatch.setattr(version, "_read_url", read_url)
+    monkeypatch.setattr(version, "MIRROR", None)
+    monkeypatch.setattr(version, "OFFLINE", False)
+
+
+def test_missing_version_is_not_fetched_from_the_bucket(no_bucket):
+    with pytest.raises(OSError, match="prefetch_versions.py"):
+        version.fetch_version_file("dictionary_1999-01-01_00:00:00")
+
+
+def test_listing_without_cache_reads_the_versions_folder(no_bucket, monkeypatch):
+    monkeypatch.setattr(version, "_read_listing", lambda: None)
+    assert version.get_available_dictionary_version() == [
+        e["name"] for e in version._folder_listing(version.VERSIONS_FOLDER)]
+
+
+@pytest.fixture
+def changesets(dictionary, monkeypatch):
+    # new versions are created over the test dictionary
+    monkeypatch.setattr(version, "latest_dictionary_version", lambda: dictionary.version)
+    return dictionary
+
+
+def _scripts(*codes):
+    from ieml.dictionary.script import script
+    return [str(script(c)) for c in codes]
+
+
+def _glosses(scripts):
+    from ieml.constants import LANGUAGES
+    return {lang: {s: f"{lang} {s}" for s in scripts} for lang in LANGUAGES}
+
+
+def _assert_relations_match_full_build(v):
+    from ieml.dictionary import Dictionary
+    from ieml.dictionary.relations import RELATIONS, RelationsGraph
+
+    d = Dictionary(v)
+    assert d.version.changeset is not None and v.is_cached
+    full = RelationsGraph(dictionary=d)
+    for reltype in RELATIONS:
+        incremental, rebuilt = d.relations_graph.relations[reltype], full.relations[reltype]
+        assert incremental.shape == rebuilt.shape, reltype
+        assert (incremental != rebuilt).nnz == 0, reltype
+    return d
+
+
+def test_changeset_relations_match_a_full_build(changesets):
+    from ieml.dictionary.script import script
+
+    base = changesets.version
+    (sub,) = _scripts("O:U:.")
+    # a new paradigm inside a root paradigm
+    v1 = version.create_dictionary_version(base, add={"terms": [sub], "translations": _glosses([sub])})
+    d1 = _assert_relations_match_full_build(v1)
+    assert sub in v1.terms and v1.translations["en"][sub] == f"en {sub}"
+
+    # a new root paradigm and an inhibition change
+    root = script("M:O:.")
+    added = _scripts("M:O:.") + [str(s) for s in root.singular_sequences if str(s) not in v1.terms]
+    v2 = version.create_dictionary_version(v1, add={"terms": added, "roots": added[:1],
+                                                    "inhibitions": {added[0]: []},
+                                                    "translations": _glosses(added)},
+                                           update={"inhibitions": {_scripts("M:M:.")[0]: ["opposed", "twin"]}})
+    d2 = _assert_relations_match_full_build(v2)
+    assert version._affected_roots(d1, d2) >= set(added[:1] + _scripts("M:M:."))
+
+    # a removal and a retranslation, materialized from the changeset files on load
+    v3 = version.create_dictionary_version(v2, remove=[sub], check=False,
+                                           update={"translations": {"en": {added[0]: "renamed"}, "fr": {}}})
+    assert not v3.is_cached
+    version.build_changeset_dictionary(v3)
+    d3 = _assert_relations_match_full_build(v3)
+    assert sub not in v3.terms and len(d3) == len(d2) - 1
+    assert version.Changeset.read(v3).base == v2 and v3.translations["en"][added[0]] == "renamed"
+
+
+def _chained_diff(new, older):
+    # the per-version walk composed_diff replaces: every script of `older`
+    # followed through each diff in turn
+    result = {sc: sc for sc in older.terms}
+    for v in sorted(filter(lambda v: v >= older, (version.DictionaryVersion(v) for v in new.diff))):
+        diff = new.diff[str(v)]
+        for sc_old, sc_new in result.items():
+            if diff.get(sc_new):
+                result[sc_old] = diff[sc_new]
+    return result
+
+
+@pytest.fixture(scope="module")
+def history():
+    """
+    Versions 1990-01-0N with random renames and removals between them; the
+    last one carries every diff.
+    :return: list of DictionaryVersion, oldest first
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    terms = [f"t{i}" for i in range(300)]
+    states, diffs, fresh = [], {}, iter(range(10 ** 6))
+    for n in range(1, 6):
+        name = f"1990-01-0{n}_00:00:00"
+        states.append({"version": name, "terms": list(terms), "roots": [], "inhibitions": {},
+                       "translations": {}, "diff": dict(diffs)})
+        changed = rng.choice(len(terms), size=40, replace=False)
+        diff = {}
+        for k, i in enumerate(changed.tolist()):
+            # one in five is removed
+            diff[terms[i]] = None if k % 5 == 0 else f"r{next(fresh)}"
+        diffs[f"dictionary_{name}"] = diff
+        terms = [diff.get(t, t) for t in terms if diff.get(t, t)]
+
+    versions = []
+    for state in states:
+        v = version.DictionaryVersion(state["version"])
+        v.__setstate__(state)
+        versions.append(v)
+    return versions
+
+
+def test_composed_diff_matches_the_chained_diffs(history):
+    new = history[-1]
+    for older in history[:-1]:
+        assert new.diff_for_version(older) == _chained_diff(new, older)
+
+
+def test_composed_diff_is_persisted(history):
+    new, older = history[-1], history[1]
+    composed = new.composed_diff(older)
+    assert os.path.isfile(version._version_file("diff", older, new))
+
+    # a fresh process reads it back instead of composing the diffs again
+    diff, new.diff, new._composed_diffs = new.diff, {}, {}
+    try:
+        assert new.composed_diff(older) == composed
+    finally:
+        new.diff, new._composed_diffs = diff, {}
+
+
+def test_translate_codes(history):
+    new, older = history[-1], history[0]
+    first = new.diff[str(older)]
+    renamed = [old for old, sc in first.items() if sc][:5]
+    deleted = [old for old, sc in first.items() if sc is None][:5]
+    kept = [t for t in older.terms if t not in new.composed_diff(older)][:5]
+    codes = renamed + deleted + kept + ["unknown"]
+
+    translated = new.translate_codes(codes, older).tolist()
+    expected = new.diff_for_version(older)
+    assert translated[:len(renamed)] == [expected[c] for c in renamed]
+    # deleted and unchanged scripts are left as they are
+    assert translated[len(renamed):] == deleted + kept + ["unknown"]
+    assert new.translate_codes([], older).tolist() == []